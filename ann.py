@@ -0,0 +1,368 @@
+import numpy as np
+
+# Nearest-neighbour backends for scoring a query against an embedding matrix.
+#
+# Every backend exposes search(query, k, threshold=None) -> (row ids, scores)
+# ranked by inner product, best first, dropping rows scoring below threshold,
+# remove(ids) to stop returning deleted rows and extend(vectors) to take on rows
+# appended to the matrix since.  Small collections always use exact brute force; above
+# EXACT_SEARCH_LIMIT rows an approximate index is built:
+#   "ivf"   - in-repo IVF-flat over NumPy, recall/latency tuned with nprobe
+#   "faiss" - faiss IndexIVFFlat, if faiss is installed
+#   "hnsw"  - hnswlib HNSW graph, if hnswlib is installed, tuned with ef
+# "auto" picks faiss, then hnswlib, then the NumPy IVF.
+#
+# Vectors and queries are expected to be L2-normalized, so scores are cosine
+# similarities and the IVF index can prune whole lists against a threshold.
+
+EXACT_SEARCH_LIMIT = 50000
+# Rows scored per matrix-vector product, bounds how much of a memory-mapped matrix is touched at once
+SCORE_CHUNK = 65536
+DEFAULT_NPROBE = 16
+DEFAULT_EF = 128
+# IVF lists are retrained once the row count has doubled or halved since training,
+# or the largest list holds this many times the average
+MAX_LIST_IMBALANCE = 8
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+def top_k(scores, k, threshold=None):
+    # Positions of the k highest scores (>= threshold), best first, in O(N + k log k)
+    ids = np.arange(len(scores)) if threshold is None else np.flatnonzero(scores >= threshold)
+    if threshold is not None:
+        scores = scores[ids]
+
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    if k < len(scores):
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return ids[best], scores[best]
+
+
+def chunked_scores(vectors, query, chunk_size=SCORE_CHUNK):
+    # vectors @ query without materializing a memory-mapped matrix in one go.
+    # query may be (D,) or (D, Q) for several queries at once.
+    scores = np.empty((len(vectors),) + query.shape[1:], dtype=np.float32)
+    for start in range(0, len(vectors), chunk_size):
+        scores[start:start + chunk_size] = vectors[start:start + chunk_size] @ query
+    return scores
+
+
+def _filter(ids, scores, threshold):
+    if threshold is None:
+        return ids, scores
+    keep = scores >= threshold
+    return ids[keep], scores[keep]
+
+
+def drop_removed(ids, scores):
+    # Removed rows are scored -inf, which only makes it into a top-k without a threshold
+    keep = scores > -np.inf
+    return ids[keep], scores[keep]
+
+
+def removed_mask(removed, size, ids):
+    if removed is None:
+        removed = np.zeros(size, dtype=bool)
+    removed[np.asarray(ids, dtype=np.int64)] = True
+    return removed
+
+
+class ExactSearch:
+    name = "exact"
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.removed = None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def remove(self, ids):
+        self.removed = removed_mask(self.removed, len(self.vectors), ids)
+
+    def extend(self, vectors):
+        if self.removed is not None:
+            self.removed = np.concatenate([self.removed, np.zeros(len(vectors) - len(self.removed), dtype=bool)])
+        self.vectors = vectors
+
+    def search(self, query, k, threshold=None):
+        scores = chunked_scores(self.vectors, query)
+        if self.removed is None:
+            return top_k(scores, k, threshold)
+        scores[self.removed] = -np.inf
+        return drop_removed(*top_k(scores, k, threshold))
+
+    def search_batch(self, queries, k, threshold=None):
+        # (Q, D) queries: one matrix-matrix product per chunk instead of Q matrix-vector products
+        scores = np.ascontiguousarray(chunked_scores(self.vectors, queries.T).T)
+        if self.removed is None:
+            return [top_k(row, k, threshold) for row in scores]
+        scores[:, self.removed] = -np.inf
+        return [drop_removed(*top_k(row, k, threshold)) for row in scores]
+
+
+def _assign(vectors, centroids, chunk_size=65536):
+    # Index of the highest inner-product centroid for every vector
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = vectors[start:start + chunk_size]
+        assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def _centroid_similarity(vectors, centroids, assignments, chunk_size=65536):
+    # Inner product of every vector with its own centroid
+    similarity = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = vectors[start:start + chunk_size]
+        similarity[start:start + chunk_size] = np.einsum(
+            "ij,ij->i", chunk, centroids[assignments[start:start + chunk_size]]
+        )
+    return similarity
+
+
+def train_kmeans(vectors, nlist, iterations=10, sample_size=None, seed=0):
+    # Spherical k-means on a random sample, returns unit-norm centroids (nlist, D)
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), sample_size or nlist * 64)
+    sample = np.asarray(vectors[rng.choice(len(vectors), sample_size, replace=False)], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        counts = np.bincount(assignments, minlength=nlist)
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        # reduceat misbehaves on empty groups, those are re-seeded below anyway
+        sums = np.add.reduceat(sample[order], np.minimum(starts, len(sample) - 1), axis=0)
+
+        # Re-seed empty clusters from random sample points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+            counts[empty] = 1
+        centroids = sums / counts[:, None]
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+    return centroids.astype(np.float32)
+
+
+class IVFFlatSearch:
+    name = "ivf"
+
+    def __init__(self, vectors, nlist=None, nprobe=DEFAULT_NPROBE, centroids=None, assignments=None,
+                 radii=None, trained_rows=None):
+        # centroids, assignments, radii and trained_rows restore a state(); assignments may
+        # cover only the first rows of vectors, extend() assigns the rest
+        self.vectors = vectors
+        self.nprobe = nprobe
+
+        if centroids is None:
+            nlist = nlist or max(1, min(len(vectors) // 39, int(4 * np.sqrt(len(vectors)))))
+            centroids = train_kmeans(vectors, nlist)
+        if assignments is None:
+            assignments = _assign(vectors, centroids)
+        self.centroids = centroids
+        # Removed rows are assigned to len(centroids), a list no query probes
+        self.assignments = assignments
+        self.trained_rows = int(trained_rows) if trained_rows is not None else len(assignments)
+        self._build_lists()
+
+        # Angular radius of each list around its centroid, used to skip lists that
+        # cannot contain anything above the similarity threshold
+        if radii is None:
+            self.radii = np.zeros(len(centroids), dtype=np.float32)
+            self._widen_radii(vectors[:len(assignments)], assignments)
+        else:
+            self.radii = radii
+
+    def _build_lists(self):
+        # Inverted lists: row ids grouped by centroid, list c is ids[offsets[c]:offsets[c + 1]]
+        nlist = len(self.centroids)
+        counts = np.bincount(self.assignments, minlength=nlist + 1)[:nlist]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.ids = np.argsort(self.assignments, kind="stable")[:self.offsets[-1]]
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _widen_radii(self, vectors, assignments):
+        # Grow each list's radius to cover the given rows assigned to it
+        live = assignments < len(self.centroids)
+        similarity = _centroid_similarity(vectors, self.centroids, np.minimum(assignments, len(self.centroids) - 1))
+        min_similarity = np.cos(self.radii).astype(np.float32)
+        np.minimum.at(min_similarity, assignments[live], similarity[live])
+        self.radii = np.arccos(np.clip(min_similarity, -1.0, 1.0))
+
+    def remove(self, ids):
+        # Radii are left as they are, a list only gets tighter when rows leave it
+        self.assignments = self.assignments.copy()
+        self.assignments[np.asarray(ids, dtype=np.int64)] = len(self.centroids)
+        self._build_lists()
+
+    def extend(self, vectors):
+        # New rows join the lists of their nearest existing centroid, nothing is retrained
+        start = len(self.assignments)
+        self.vectors = vectors
+        if start >= len(vectors):
+            return
+        new_assignments = _assign(vectors[start:], self.centroids)
+        self._widen_radii(vectors[start:], new_assignments)
+        self.assignments = np.concatenate([self.assignments, new_assignments])
+        self._build_lists()
+
+    def balanced(self):
+        # False once added and removed rows have skewed the lists enough to retrain
+        live = int(self.offsets[-1])
+        if live > 2 * self.trained_rows or 2 * live < self.trained_rows:
+            return False
+        return np.diff(self.offsets).max() <= MAX_LIST_IMBALANCE * max(live / len(self.centroids), 1.0)
+
+    def search(self, query, k, threshold=None, nprobe=None):
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probe, _ = top_k(centroid_scores, nprobe)
+
+        if threshold is not None:
+            # For unit vectors no member can beat cos(query-centroid angle - list radius)
+            angles = np.arccos(np.clip(centroid_scores[probe], -1.0, 1.0))
+            probe = probe[np.cos(np.maximum(angles - self.radii[probe], 0.0)) >= threshold]
+            if not len(probe):
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        candidates = np.concatenate([self.ids[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+
+        order, scores = top_k(self.vectors[candidates] @ query, k, threshold)
+        return candidates[order], scores
+
+    def state(self):
+        return {"centroids": self.centroids, "assignments": self.assignments,
+                "radii": self.radii, "trained_rows": self.trained_rows}
+
+
+class FaissSearch:
+    name = "faiss"
+
+    def __init__(self, vectors, nlist=None, nprobe=DEFAULT_NPROBE):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        nlist = nlist or max(1, min(len(vectors) // 39, int(4 * np.sqrt(len(vectors)))))
+        self.quantizer = faiss.IndexFlatIP(vectors.shape[1])
+        self.index = faiss.IndexIVFFlat(self.quantizer, vectors.shape[1], nlist, faiss.METRIC_INNER_PRODUCT)
+        self.index.train(vectors)
+        self.index.add(vectors)
+        self.index.nprobe = nprobe
+        self.rows = len(vectors)
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def remove(self, ids):
+        self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+
+    def extend(self, vectors):
+        # Explicit ids, faiss would otherwise number new rows from ntotal, which removals lower
+        if self.rows < len(vectors):
+            new_rows = np.ascontiguousarray(vectors[self.rows:], dtype=np.float32)
+            self.index.add_with_ids(new_rows, np.arange(self.rows, len(vectors), dtype=np.int64))
+            self.rows = len(vectors)
+
+    def search(self, query, k, threshold=None, nprobe=None):
+        if nprobe:
+            self.index.nprobe = nprobe
+        scores, ids = self.index.search(query.reshape(1, -1).astype(np.float32), k)
+        keep = ids[0] >= 0
+        return _filter(ids[0][keep], scores[0][keep], threshold)
+
+    def search_batch(self, queries, k, threshold=None):
+        scores, ids = self.index.search(np.ascontiguousarray(queries, dtype=np.float32), k)
+        return [_filter(row_ids[row_ids >= 0], row_scores[row_ids >= 0], threshold)
+                for row_ids, row_scores in zip(ids, scores)]
+
+
+class HnswSearch:
+    name = "hnsw"
+
+    def __init__(self, vectors, ef=DEFAULT_EF, ef_construction=200, m=16):
+        self.index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+        self.index.init_index(max_elements=len(vectors), ef_construction=ef_construction, M=m)
+        self.index.add_items(np.asarray(vectors, dtype=np.float32), np.arange(len(vectors)))
+        self.index.set_ef(ef)
+        self.removed = 0
+
+    def __len__(self):
+        # Live elements; knn_query fails when asked for more than that
+        return self.index.get_current_count() - self.removed
+
+    def remove(self, ids):
+        for row in np.asarray(ids, dtype=np.int64).tolist():
+            self.index.mark_deleted(row)
+        self.removed += len(ids)
+
+    def extend(self, vectors):
+        start = self.index.get_current_count()
+        if start < len(vectors):
+            self.index.resize_index(len(vectors))
+            self.index.add_items(np.asarray(vectors[start:], dtype=np.float32), np.arange(start, len(vectors)))
+
+    def search(self, query, k, threshold=None, ef=None):
+        if ef:
+            self.index.set_ef(max(ef, k))
+        k = min(k, len(self))
+        ids, distances = self.index.knn_query(query.reshape(1, -1).astype(np.float32), k=k)
+        # hnswlib's "ip" distance is 1 - inner product
+        return _filter(ids[0].astype(np.int64), 1.0 - distances[0], threshold)
+
+    def search_batch(self, queries, k, threshold=None):
+        ids, distances = self.index.knn_query(np.asarray(queries, dtype=np.float32), k=min(k, len(self)))
+        return [_filter(row_ids.astype(np.int64), 1.0 - row_distances, threshold)
+                for row_ids, row_distances in zip(ids, distances)]
+
+
+def search_batch(index, queries, k, threshold=None):
+    # One (ids, scores) pair per query row, batched where the backend supports it
+    if hasattr(index, "search_batch"):
+        return index.search_batch(queries, k, threshold)
+    return [index.search(query, k, threshold) for query in queries]
+
+
+def available_backends():
+    backends = ["exact", "ivf"]
+    if faiss is not None:
+        backends.append("faiss")
+    if hnswlib is not None:
+        backends.append("hnsw")
+    return backends
+
+
+def create_ann_index(vectors, backend="auto", exact_limit=EXACT_SEARCH_LIMIT, **params):
+    if backend == "exact" or len(vectors) < exact_limit:
+        return ExactSearch(vectors)
+
+    if backend == "auto":
+        backend = "faiss" if faiss is not None else "hnsw" if hnswlib is not None else "ivf"
+
+    if backend == "ivf":
+        return IVFFlatSearch(vectors, **params)
+    if backend == "faiss":
+        if faiss is None:
+            raise ImportError("faiss is not installed")
+        return FaissSearch(vectors, **params)
+    if backend == "hnsw":
+        if hnswlib is None:
+            raise ImportError("hnswlib is not installed")
+        return HnswSearch(vectors, **params)
+    raise ValueError(f"Unknown ANN backend: {backend}")
@@ -0,0 +1,424 @@
+import os
+import sys
+import time
+import argparse
+import itertools
+import tempfile
+import numpy as np
+from PIL import Image
+
+# Performance benchmarks for the search pipeline.
+#
+#   python benchmark.py encode --folder ~/Pictures --batch-sizes 1,32,64,128
+#
+# Every benchmark falls back to synthetic data when no folder is given.
+
+SUPPORTED_FORMATS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif')
+
+
+def load_model(device, pretrained='laion2b_s34b_b79k'):
+    from clip_model import load_clip_model
+    # Throughput doesn't depend on the weights, so --pretrained "" runs offline
+    model, preprocess, device, _ = load_clip_model(pretrained=pretrained, device=device)
+    return model, preprocess, device
+
+
+def synthetic_images(count, size=(640, 480), seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+        for _ in range(count)
+    ]
+
+
+def write_synthetic_folder(folder, count, size=(640, 480)):
+    for i, img in enumerate(synthetic_images(count, size)):
+        img.save(os.path.join(folder, f"synthetic_{i:05d}.jpg"), quality=90)
+
+
+def folder_paths(folder, limit):
+    from folder_scan import iter_images
+    return [path for path, _ in itertools.islice(iter_images(folder, SUPPORTED_FORMATS), limit)]
+
+
+def folder_images(paths):
+    images = []
+    for path in paths:
+        try:
+            images.append(Image.open(path).convert("RGB"))
+        except Exception as e:
+            print(f"Error loading {path}: {e}")
+    return images
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def bench_encode(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.folder
+        if not folder:
+            write_synthetic_folder(tmp, args.count)
+            folder = tmp
+        _bench_encode(args, folder_paths(folder, args.count))
+
+
+def _bench_encode(args, paths):
+    from image_pipeline import encode_image, encode_images, encode_batches, iter_preprocessed_batches
+
+    model, preprocess, device = load_model(args.device, args.pretrained)
+    images = folder_images(paths)
+    print(f"Encoding {len(images)} images on {device}")
+
+    # Warm up so lazy initialisation doesn't count against the first run
+    encode_images(images[:2], preprocess, model, device, batch_size=2)
+
+    start = time.perf_counter()
+    for img in images:
+        encode_image(img, preprocess, model, device)
+    baseline = time.perf_counter() - start
+    print(f"{'per-image':>16}: {len(images) / baseline:8.1f} img/s")
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        features = encode_images(images, preprocess, model, device, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"{'batch ' + str(batch_size):>16}: {len(images) / elapsed:8.1f} img/s "
+              f"({baseline / elapsed:.2f}x, shape {features.shape})")
+
+    # End to end from file paths, including decode and preprocess
+    for workers in args.workers:
+        start = time.perf_counter()
+        batches = iter_preprocessed_batches(paths, preprocess, batch_size=args.batch_sizes[0],
+                                            workers=workers, prefetch=args.prefetch)
+        count = sum(len(batch_paths) for batch_paths, _ in encode_batches(batches, model, device))
+        elapsed = time.perf_counter() - start
+        print(f"{'pipeline w=' + str(workers):>16}: {count / elapsed:8.1f} img/s (decode + encode)")
+
+
+def bench_decode(args):
+    from image_pipeline import load_image
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.folder
+        if not folder:
+            write_synthetic_folder(tmp, args.count, size=(4000, 3000))
+            folder = tmp
+        paths = folder_paths(folder, args.count)
+        print(f"Decoding {len(paths)} images")
+
+        for label, min_size in (("full", None), (f"reduced {args.min_size}", args.min_size)):
+            start = time.perf_counter()
+            pixels = 0
+            for path in paths:
+                img = load_image(path, min_size)
+                pixels += img.width * img.height
+            elapsed = time.perf_counter() - start
+            print(f"{label:>16}: {len(paths) / elapsed:8.1f} img/s, "
+                  f"{pixels * 3 / len(paths) / 1024 ** 2:7.1f} MB decoded per image")
+
+
+def synthetic_embeddings(count, dim=512, clusters=256, seed=0):
+    # Clustered unit vectors, closer to real CLIP embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(found, truth):
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+def run_queries(index, queries, k, **params):
+    start = time.perf_counter()
+    found = [index.search(q, k, **params)[0] for q in queries]
+    return found, len(queries) / (time.perf_counter() - start)
+
+
+def bench_ann(args):
+    from ann import ExactSearch, create_ann_index, available_backends
+
+    vectors = synthetic_embeddings(args.count, seed=0)
+    queries = synthetic_embeddings(args.queries, seed=1)
+    print(f"{args.count} vectors, {args.queries} queries, recall@{args.k}")
+
+    exact = ExactSearch(vectors)
+    truth, exact_qps = run_queries(exact, queries, args.k)
+    print(f"{'exact':>16}: recall 1.000, {exact_qps:8.1f} QPS")
+
+    for backend in available_backends():
+        if backend == "exact":
+            continue
+        start = time.perf_counter()
+        index = create_ann_index(vectors, backend, exact_limit=0)
+        print(f"{backend:>16}: built in {time.perf_counter() - start:.1f}s")
+
+        knob = "ef" if backend == "hnsw" else "nprobe"
+        values = [max(v * 4, args.k) for v in args.nprobe] if backend == "hnsw" else args.nprobe
+        for value in values:
+            found, qps = run_queries(index, queries, args.k, **{knob: value})
+            print(f"{f'{knob}={value}':>16}: recall {recall_at_k(found, truth):.3f}, "
+                  f"{qps:8.1f} QPS ({qps / exact_qps:.1f}x)")
+
+
+def bench_quantize(args):
+    from ann import ExactSearch
+    from quantization import create_codec, QuantizedSearch
+
+    vectors = synthetic_embeddings(args.count, seed=0)
+    queries = synthetic_embeddings(args.queries, seed=1)
+    print(f"{args.count} vectors, {args.queries} queries, recall@{args.k}")
+
+    exact = ExactSearch(vectors)
+    truth, exact_qps = run_queries(exact, queries, args.k)
+    print(f"{'float32':>16}: {vectors.nbytes / len(vectors):7.0f} B/image, recall 1.000, {exact_qps:8.1f} QPS")
+
+    for mode in args.modes:
+        start = time.perf_counter()
+        codec = create_codec(mode, vectors)
+        build = time.perf_counter() - start
+        for rerank in args.rerank:
+            index = QuantizedSearch(vectors, codec, rerank=rerank)
+            found, qps = run_queries(index, queries, args.k)
+            label = f"{mode} r={rerank}"
+            print(f"{label:>16}: {index.bytes_per_vector:7.0f} B/image, "
+                  f"recall {recall_at_k(found, truth):.3f}, {qps:8.1f} QPS (built in {build:.1f}s)")
+
+
+def bench_startup(args):
+    import subprocess
+
+    # Each measurement runs in a fresh interpreter so nothing is already imported
+    snippets = {
+        "import app modules": "import embedding_index, image_pipeline, clip_model",
+        "import torch": "import torch",
+        "import open_clip": "import open_clip",
+        "load model": f"from clip_model import load_clip_model; load_clip_model(pretrained={args.pretrained!r})",
+    }
+    for label, code in snippets.items():
+        timed = f"import time; _t = time.perf_counter(); {code}; print(time.perf_counter() - _t)"
+        result = subprocess.run([sys.executable, "-c", timed], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode != 0:
+            print(f"{label:>20}: failed ({result.stderr.strip().splitlines()[-1]})")
+            continue
+        print(f"{label:>20}: {float(result.stdout.strip().splitlines()[-1]):6.2f}s")
+    print("The apps print [startup] timings for first paint, model ready and first search.")
+
+
+def write_nested_folder(folder, years, months, days, per_day):
+    # year/month/day tree of tiny placeholder files, enough to time a scan
+    for year, month, day in itertools.product(range(years), range(1, months + 1), range(1, days + 1)):
+        day_dir = os.path.join(folder, str(2000 + year), f"{month:02d}", f"{day:02d}")
+        os.makedirs(day_dir, exist_ok=True)
+        for i in range(per_day):
+            with open(os.path.join(day_dir, f"img_{i:03d}.jpg"), "wb") as f:
+                f.write(b"\xff\xd8")
+
+
+def bench_scan(args):
+    from folder_scan import scan_images
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.folder
+        if not folder:
+            folder = tmp
+            write_nested_folder(folder, args.years, 12, 28, args.per_day)
+        for workers in args.workers:
+            start = time.perf_counter()
+            count = len(scan_images(folder, SUPPORTED_FORMATS, workers=workers))
+            elapsed = time.perf_counter() - start
+            print(f"{'workers=' + str(workers):>16}: {count} images in {elapsed * 1000:8.1f} ms")
+
+
+def latency_percentiles(latencies):
+    ms = np.asarray(latencies) * 1000
+    return {p: np.percentile(ms, p) for p in (50, 95, 99)}
+
+
+def run_load(search, prompts, clients, requests):
+    # Each of the client threads runs its searches back to back; returns (latencies, QPS)
+    import threading
+
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        own = []
+        for i in range(requests):
+            start = time.perf_counter()
+            search(prompts[(offset + i) % len(prompts)])
+            own.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, len(latencies) / (time.perf_counter() - start)
+
+
+def bench_serve(args):
+    from search_engine import SearchEngine
+    from embedding_index import EmbeddingIndex
+    from query_batcher import QueryBatcher
+    from result_cache import ResultCache
+
+    # In-memory synthetic index registered directly with the engine, as a warm server would hold it.
+    # Prompt and result caches are off so every search encodes its prompt and scores the index.
+    engine = SearchEngine(pretrained=args.pretrained, device=args.device,
+                          prompt_cache_size=0, persist_prompts=False)
+    engine.result_cache = ResultCache(max_entries=0)
+    engine.load_model()
+    index = EmbeddingIndex("synthetic", cache_dir=tempfile.gettempdir())
+    index.embeddings = synthetic_embeddings(args.count)
+    index.paths = [f"synthetic_{i:07d}.jpg" for i in range(args.count)]
+    engine.indexes["synthetic"] = index
+    engine.folder_path = "synthetic"
+
+    prompts = [f"a photo of {i} {subject}" for i, subject in
+               enumerate(["cats", "dogs", "cars", "trees", "beaches", "mountains", "people", "food"] * 8)]
+    print(f"{args.count} images, {args.requests} searches per client, k={args.k}")
+
+    batcher = QueryBatcher(engine, args.max_wait_ms / 1000.0, args.max_batch)
+    modes = {
+        "unbatched": lambda prompt: engine.search(prompt, args.k, refresh=False),
+        "batched": lambda prompt: batcher.search(prompt, args.k),
+    }
+    for clients in args.clients:
+        for label, search in modes.items():
+            batches, queries = batcher.batches, batcher.queries
+            latencies, qps = run_load(search, prompts, clients, args.requests)
+            p = latency_percentiles(latencies)
+            extra = ""
+            if label == "batched" and batcher.batches > batches:
+                extra = f", mean batch {(batcher.queries - queries) / (batcher.batches - batches):.1f}"
+            print(f"{clients:3d} clients {label:>10}: p50 {p[50]:7.1f}ms  p95 {p[95]:7.1f}ms  "
+                  f"p99 {p[99]:7.1f}ms  {qps:7.1f} QPS{extra}")
+
+
+def typing_bursts(prompt):
+    # The prompts a debounced search box sees while this one is typed, one per word
+    words = prompt.split()
+    return [" ".join(words[:i]) for i in range(1, len(words) + 1)]
+
+
+def bench_instant(args):
+    from search_engine import SearchEngine
+    from embedding_index import EmbeddingIndex
+
+    engine = SearchEngine(pretrained=args.pretrained, device=args.device)
+    engine.load_model()
+    index = EmbeddingIndex("synthetic", cache_dir=tempfile.gettempdir())
+    index.embeddings = synthetic_embeddings(args.count)
+    index.paths = [f"synthetic_{i:07d}.jpg" for i in range(args.count)]
+    engine.indexes["synthetic"] = index
+    engine.folder_path = "synthetic"
+    engine.search("warm up", args.k, refresh=False)
+
+    prompts = ["a dog running on the beach at sunset", "red sports car parked in a city street",
+               "family having dinner around a table", "snowy mountains reflected in a lake"]
+    bursts = [burst for prompt in prompts for burst in typing_bursts(prompt)]
+    print(f"{args.count} images, {len(bursts)} keystroke bursts, k={args.k}, budget {args.budget_ms:.0f} ms")
+
+    def run(label, before=None):
+        latencies = []
+        for burst in bursts:
+            if before:
+                before()
+            start = time.perf_counter()
+            engine.search(burst, args.k, refresh=False)
+            latencies.append(time.perf_counter() - start)
+        p = latency_percentiles(latencies)
+        verdict = "ok" if p[95] <= args.budget_ms else "OVER BUDGET"
+        print(f"{label:>28}: p50 {p[50]:7.1f}ms  p95 {p[95]:7.1f}ms  max {max(latencies) * 1000:7.1f}ms  {verdict}")
+
+    # New prompts pay for a text encode, retyped ones only for scoring, repeats for neither
+    engine.prompt_cache.entries.clear()
+    run("new prompt (encode + score)", lambda: engine.result_cache.invalidate())
+    run("cached prompt (score only)", lambda: engine.result_cache.invalidate())
+    run("repeated prompt (cached)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Image search benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--device", default=None)
+    common.add_argument("--pretrained", default="laion2b_s34b_b79k",
+                        help='open_clip weights tag, "" for random weights')
+
+    encode = subparsers.add_parser("encode", parents=[common],
+                                   help="per-image vs batched image encoding throughput")
+    encode.add_argument("--folder", help="folder of real images (default: synthetic)")
+    encode.add_argument("--count", type=int, default=256)
+    encode.add_argument("--batch-sizes", type=parse_int_list, default=[32, 64, 128, 256])
+    encode.add_argument("--workers", type=parse_int_list, default=[0, os.cpu_count() or 1],
+                        help="decode worker counts to try for the end-to-end pipeline")
+    encode.add_argument("--prefetch", type=int, default=2)
+    encode.set_defaults(func=bench_encode)
+
+    decode = subparsers.add_parser("decode", help="full vs reduced-resolution image decoding")
+    decode.add_argument("--folder", help="folder of real images (default: synthetic 4000x3000 JPEGs)")
+    decode.add_argument("--count", type=int, default=32)
+    decode.add_argument("--min-size", type=int, default=224)
+    decode.set_defaults(func=bench_decode)
+
+    ann = subparsers.add_parser("ann", help="recall@k and QPS of ANN backends vs exact search")
+    ann.add_argument("--count", type=int, default=200000)
+    ann.add_argument("--queries", type=int, default=200)
+    ann.add_argument("-k", type=int, default=10)
+    ann.add_argument("--nprobe", type=parse_int_list, default=[4, 8, 16, 32, 64])
+    ann.set_defaults(func=bench_ann)
+
+    quantize = subparsers.add_parser("quantize", help="memory per image and recall of quantized storage")
+    quantize.add_argument("--count", type=int, default=100000)
+    quantize.add_argument("--queries", type=int, default=200)
+    quantize.add_argument("-k", type=int, default=10)
+    quantize.add_argument("--modes", type=lambda v: v.split(","), default=["float16", "int8", "pq"])
+    quantize.add_argument("--rerank", type=parse_int_list, default=[1, 4, 16],
+                          help="candidates re-ranked in full precision, as a multiple of k")
+    quantize.set_defaults(func=bench_quantize)
+
+    startup = subparsers.add_parser("startup", parents=[common],
+                                    help="cold import and model load times paid before a first search")
+    startup.set_defaults(func=bench_startup)
+
+    scan = subparsers.add_parser("scan", help="recursive folder scan time by directory-walking threads")
+    scan.add_argument("--folder", help="folder to scan, e.g. on a network mount (default: synthetic year/month/day tree)")
+    scan.add_argument("--years", type=int, default=3)
+    scan.add_argument("--per-day", type=int, default=10)
+    scan.add_argument("--workers", type=parse_int_list, default=[0, 4, 16])
+    scan.set_defaults(func=bench_scan)
+
+    serve = subparsers.add_parser("serve", parents=[common],
+                                  help="search latency percentiles under concurrent load, with and without batching")
+    serve.add_argument("--count", type=int, default=100000)
+    serve.add_argument("--clients", type=parse_int_list, default=[1, 8, 32])
+    serve.add_argument("--requests", type=int, default=50, help="searches per client")
+    serve.add_argument("-k", type=int, default=10)
+    serve.add_argument("--max-wait-ms", type=float, default=5.0)
+    serve.add_argument("--max-batch", type=int, default=32)
+    serve.set_defaults(func=bench_serve)
+
+    instant = subparsers.add_parser("instant", parents=[common],
+                                    help="search-as-you-type latency per keystroke burst against a budget")
+    instant.add_argument("--count", type=int, default=100000)
+    instant.add_argument("-k", type=int, default=50)
+    instant.add_argument("--budget-ms", type=float, default=100.0)
+    instant.set_defaults(func=bench_instant)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+import time
+
+# CLIP model loading, kept free of top-level torch/open_clip imports so the apps
+# can paint their window before paying for them.
+
+MODEL_NAME = 'ViT-B-32'
+PRETRAINED = 'laion2b_s34b_b79k'
+
+
+def pick_device():
+    import torch
+    return "mps" if torch.backends.mps.is_available() else "cpu"
+
+
+def load_clip_model(model_name=MODEL_NAME, pretrained=PRETRAINED, device=None):
+    # Returns (model, preprocess, device, seconds taken), importing torch/open_clip on first use
+    start = time.perf_counter()
+    import open_clip
+
+    device = device or pick_device()
+    model, _, preprocess = open_clip.create_model_and_transforms(model_name, pretrained=pretrained or None)
+    model.to(device)
+    model.eval()
+    return model, preprocess, device, time.perf_counter() - start
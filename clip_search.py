@@ -1,14 +1,16 @@
 import os
 import io
 import time
-import torch
-import open_clip
+APP_START = time.perf_counter()  # taken before the remaining imports, for startup timing
 import threading
 from PIL import Image
 import tkinter as tk
 from tkinter import filedialog
 import customtkinter as ctk
 from CTkMessagebox import CTkMessagebox
+from search_server import create_engine
+from embedding_index import IMAGE_EXTENSIONS
+from thumbnail_cache import ThumbnailCache
 
 # Configuration
 ctk.set_appearance_mode("System")
@@ -20,12 +22,13 @@ class ImageSearchApp(ctk.CTk):
         self.title("EDAI Image Finder with CLIP")
         self.geometry("1200x800")
         
-        # Initialize AI Model
-        self.device = "mps" if torch.backends.mps.is_available() else "cpu"
-        self.model, _, self.preprocess = open_clip.create_model_and_transforms(
-            'ViT-B-32', pretrained='laion2b_s34b_b79k'
+        # Search engine (in-process, or the shared search server when EDAI_SEARCH_SERVER is set);
+        # its model is loaded by initialize_model on a background thread
+        self.engine = create_engine(extensions=SUPPORTED_FORMATS)
+        self.thumbnails = ThumbnailCache(
+            self.engine.thumbnail_store, image_factory=lambda img: ctk.CTkImage(img, size=img.size)
         )
-        self.model.to(self.device)
+        self.first_search_logged = False
         
         # UI Setup
         self.create_widgets()
@@ -33,7 +36,10 @@ class ImageSearchApp(ctk.CTk):
         
         # Start loading model in background
         self.loading = True
+        self.search_btn.configure(state="disabled")
         threading.Thread(target=self.initialize_model, daemon=True).start()
+        self.after_idle(lambda: self.log_startup("first paint"))
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def create_widgets(self):
         self.grid_columnconfigure(1, weight=1)
@@ -99,16 +105,25 @@ class ImageSearchApp(ctk.CTk):
         self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
 
     def initialize_model(self):
-        time.sleep(1)  # Simulate model loading
+        try:
+            load_time = self.engine.load_model()
+        except Exception as e:
+            self.after(0, lambda: CTkMessagebox(title="Error", message=f"Failed to load AI model: {e}", icon="cancel"))
+            return
         self.loading = False
+        self.log_startup(f"model ready (load took {load_time:.2f}s)")
         self.after(0, lambda: self.folder_btn.configure(state="normal"))
         self.after(0, lambda: self.search_btn.configure(state="normal"))
 
+    def log_startup(self, event):
+        print(f"[startup] {event} after {time.perf_counter() - APP_START:.2f}s")
+
     def select_folder(self):
         folder_path = filedialog.askdirectory()
         if folder_path:
             self.folder_label.configure(text=folder_path)
             self.animate_folder_select()
+            threading.Thread(target=lambda: self.engine.index(folder_path), daemon=True).start()
 
     def animate_folder_select(self):
         self.folder_label.configure(text_color="#4CAF50")
@@ -138,17 +153,7 @@ class ImageSearchApp(ctk.CTk):
     def search_images(self, folder_path, prompt):
         try:
             start_time = time.time()
-            images = load_images(folder_path)
-            text_features = encode_text(prompt, self.model, self.device)
-            
-            results = []
-            for img_path, img in images:
-                img_features = encode_image(img, self.preprocess, self.model, self.device)
-                similarity = (text_features @ img_features.T).item()
-                results.append((img_path, similarity))
-            
-            results.sort(key=lambda x: x[1], reverse=True)
-            final_results = results[:int(self.results_slider.get())]
+            final_results = self.engine.search(prompt, int(self.results_slider.get()), folder_path=folder_path)
             
             self.after(0, lambda: self.show_results(final_results, time.time() - start_time))
             
@@ -158,6 +163,10 @@ class ImageSearchApp(ctk.CTk):
             self.after(0, self.reset_ui)
 
     def show_results(self, results, search_time):
+        if not self.first_search_logged:
+            self.first_search_logged = True
+            self.log_startup("first search results")
+            
         for widget in self.scrollable_frame.winfo_children():
             widget.destroy()
             
@@ -169,9 +178,7 @@ class ImageSearchApp(ctk.CTk):
             frame = ctk.CTkFrame(self.scrollable_frame)
             frame.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
             
-            img = Image.open(img_path)
-            img.thumbnail((300, 300))
-            img_tk = ctk.CTkImage(img, size=img.size)
+            img_tk, _ = self.thumbnails.get(img_path, 280)
             label = ctk.CTkLabel(frame, image=img_tk, text="")
             label.pack(padx=5, pady=5)
             
@@ -250,31 +257,20 @@ class ImageSearchApp(ctk.CTk):
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
         CTkMessagebox(title="Info", message="Results cleared successfully!", icon="info")
 
+    def on_close(self):
+        try:
+            self.engine.close()
+        except Exception as e:
+            print(f"Error saving caches: {e}")
+        self.destroy()
+
     def reset_ui(self):
         self.progress.stop()
         self.progress.pack_forget()
         self.running = False
 
-def load_images(folder_path):
-    images = []
-    for file in os.listdir(folder_path):
-        if file.lower().endswith((".png", ".jpg", ".jpeg", ".webp")):
-            image_path = os.path.join(folder_path, file)
-            try:
-                images.append((image_path, Image.open(image_path).convert("RGB")))
-            except Exception as e:
-                print(f"Error loading {image_path}: {e}")
-    return images
-
-def encode_text(prompt, model, device):
-    text_tokens = open_clip.tokenize([prompt]).to(device)
-    with torch.no_grad():
-        return model.encode_text(text_tokens).cpu().numpy()
-
-def encode_image(image, preprocess, model, device):
-    img_tensor = preprocess(image).unsqueeze(0).to(device)
-    with torch.no_grad():
-        return model.encode_image(img_tensor).cpu().numpy()
+# Same set as the CLI and search server, whose index is keyed on it
+SUPPORTED_FORMATS = IMAGE_EXTENSIONS
 
 if __name__ == "__main__":
     app = ImageSearchApp()
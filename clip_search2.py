@@ -1,15 +1,23 @@
 import os
 import io
 import time
-import torch
-import open_clip
+APP_START = time.perf_counter()  # taken before the remaining imports, for startup timing
 import threading
-from PIL import Image, ImageTk, ImageOps
+from PIL import Image, ImageTk
 import tkinter as tk
 from tkinter import filedialog
 import customtkinter as ctk
 from CTkMessagebox import CTkMessagebox
 import math
+from search_server import create_engine
+from embedding_index import IMAGE_EXTENSIONS
+from search_engine import SearchCancelled
+from folder_watcher import FolderWatcher
+from concurrent.futures import ThreadPoolExecutor
+from thumbnail_cache import ThumbnailCache
+from ui_metrics import StallMonitor, STALL_MONITOR
+from virtual_grid import VirtualGrid
+from progress import format_eta
 
 # Configuration
 ctk.set_appearance_mode("dark")
@@ -22,17 +30,31 @@ class ImageSearchApp(ctk.CTk):
         self.geometry("1400x900")
         self.minsize(1000, 700)
         
-        # Initialize AI Model
-        self.device = "mps" if torch.backends.mps.is_available() else "cpu"
-        self.model, _, self.preprocess = open_clip.create_model_and_transforms(
-            'ViT-B-32', pretrained='laion2b_s34b_b79k'
+        # Search engine (in-process, or the shared search server when EDAI_SEARCH_SERVER is set);
+        # its model is loaded by initialize_model on a background thread
+        self.engine = create_engine(extensions=SUPPORTED_FORMATS)
+        self.thumbnails = ThumbnailCache(
+            self.engine.thumbnail_store, image_factory=lambda img: ctk.CTkImage(img, size=img.size)
         )
-        self.model.to(self.device)
+        # Thumbnails are decoded on this pool and handed back to the Tk thread
+        self.thumbnail_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="thumbnails")
+        self.render_generation = 0
+        self.pending_thumbnails = 0
+        self.placeholders = {}
+        self.first_search_logged = False
         
         # App state
         self.running = False
+        self.search_generation = 0  # bumped by every new search, older ones stop at their next check
+        self.instant_search_job = None
+        self.instant_prompt = None
+        self.indexing = False
+        self.progress_polling = False
+        self.progress_determinate = False
         self.loading = True
         self.folder_path = None
+        self.folder_stats = None  # from the index manifest, see refresh_folder_stats
+        self.folder_watcher = None
         self.search_history = []
         self.current_results = []
         
@@ -56,6 +78,9 @@ class ImageSearchApp(ctk.CTk):
         
         # Bind window events
         self.bind("<Configure>", self.on_window_resize)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after_idle(lambda: self.log_startup("first paint"))
+        self.stall_monitor = StallMonitor(self) if STALL_MONITOR else None
     
     def create_modern_ui(self):
         # Configure grid
@@ -202,14 +227,8 @@ class ImageSearchApp(ctk.CTk):
         self.create_action_buttons(sidebar)
 
     def create_search_suggestions(self):
-        suggestions = [
-            "a cat sleeping", "beautiful sunset", "modern architecture", 
-            "people laughing", "colorful flowers", "vintage car",
-            "mountain landscape", "abstract art", "food photography"
-        ]
-        
         suggestion_buttons = []
-        for suggestion in suggestions[:3]:  # Show top 3
+        for suggestion in SEARCH_SUGGESTIONS[:3]:  # Show top 3
             btn = ctk.CTkButton(
                 self.suggestions_frame,
                 text=suggestion,
@@ -242,8 +261,8 @@ class ImageSearchApp(ctk.CTk):
         self.results_slider = ctk.CTkSlider(
             results_frame,
             from_=1,
-            to=20,
-            number_of_steps=19,
+            to=500,
+            number_of_steps=499,
             command=self.update_results_label
         )
         self.results_slider.set(8)
@@ -263,11 +282,12 @@ class ImageSearchApp(ctk.CTk):
         
         ctk.CTkLabel(threshold_frame, text="Similarity Threshold:", font=ctk.CTkFont(size=12)).pack(anchor="w")
         
+        # Scores are cosine similarities; CLIP text-image matches rarely exceed 0.4
         self.threshold_slider = ctk.CTkSlider(
             threshold_frame,
-            from_=0.1,
-            to=1.0,
-            number_of_steps=9,
+            from_=0.0,
+            to=0.5,
+            number_of_steps=50,
             command=self.update_threshold_label
         )
         self.threshold_slider.set(0.2)
@@ -275,11 +295,36 @@ class ImageSearchApp(ctk.CTk):
         
         self.threshold_label = ctk.CTkLabel(
             threshold_frame,
-            text="0.2 threshold",
+            text="0.20 threshold",
             font=ctk.CTkFont(size=11),
             text_color="gray"
         )
         self.threshold_label.pack(anchor="w")
+        
+        # Decode worker processes used while indexing
+        workers_frame = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        workers_frame.pack(pady=10, padx=15, fill="x")
+        
+        ctk.CTkLabel(workers_frame, text="Indexing Workers:", font=ctk.CTkFont(size=12)).pack(anchor="w")
+        
+        max_workers = max(1, os.cpu_count() or 1)
+        self.workers_slider = ctk.CTkSlider(
+            workers_frame,
+            from_=0,
+            to=max_workers,
+            number_of_steps=max_workers,
+            command=self.update_workers_label
+        )
+        self.workers_slider.set(self.engine.decode_workers)
+        self.workers_slider.pack(pady=(5, 0), fill="x")
+        
+        self.workers_label = ctk.CTkLabel(
+            workers_frame,
+            text=f"{self.engine.decode_workers} workers",
+            font=ctk.CTkFont(size=11),
+            text_color="gray"
+        )
+        self.workers_label.pack(anchor="w")
 
     def create_search_history(self, parent):
         history_frame = ctk.CTkFrame(parent, corner_radius=10)
@@ -374,6 +419,11 @@ class ImageSearchApp(ctk.CTk):
         )
         self.results_scrollable.grid(row=1, column=0, sticky="nsew", padx=10, pady=(0, 10))
         
+        # Windowed view for the results themselves, shown in place of the scrollable frame
+        self.results_view = VirtualGrid(results_container, corner_radius=8)
+        self.results_view.grid(row=1, column=0, sticky="nsew", padx=10, pady=(0, 10))
+        self.results_view.grid_remove()
+        
         # Welcome message
         self.show_welcome_message()
 
@@ -396,7 +446,15 @@ class ImageSearchApp(ctk.CTk):
             font=ctk.CTkFont(size=11),
             text_color="orange"
         )
-        self.model_status.grid(row=0, column=1, padx=10, pady=5, sticky="e")
+        self.model_status.grid(row=0, column=2, padx=10, pady=5, sticky="e")
+
+        self.cache_status = ctk.CTkLabel(
+            status_frame,
+            text="",
+            font=ctk.CTkFont(size=11),
+            text_color="gray"
+        )
+        self.cache_status.grid(row=0, column=1, padx=10, pady=5, sticky="e")
 
     def show_welcome_message(self):
         welcome_frame = ctk.CTkFrame(self.results_scrollable, corner_radius=15)
@@ -430,7 +488,11 @@ class ImageSearchApp(ctk.CTk):
         self.results_label.configure(text=f"{int(value)} results")
 
     def update_threshold_label(self, value):
-        self.threshold_label.configure(text=f"{value:.1f} threshold")
+        self.threshold_label.configure(text=f"{value:.2f} threshold")
+
+    def update_workers_label(self, value):
+        self.engine.decode_workers = int(value)
+        self.workers_label.configure(text=f"{self.engine.decode_workers} workers")
 
     def update_header_stats(self):
         # Clear existing stats
@@ -438,21 +500,81 @@ class ImageSearchApp(ctk.CTk):
             widget.destroy()
         
         if self.folder_path:
-            # Count images in folder
-            image_count = len([f for f in os.listdir(self.folder_path) 
-                             if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))])
+            # Counts come from the index manifest, never from listing the folder here
+            if self.folder_stats is None:
+                folder_text = "📁 Counting images..."
+            else:
+                folder_count = len(self.folder_stats["folders"])
+                folder_text = (f"📁 {self.folder_stats['images']} images"
+                               + (f" in {folder_count} folders" if folder_count > 1 else ""))
             
             stats_label = ctk.CTkLabel(
                 self.stats_frame,
-                text=f"📁 {image_count} images • 🔍 {len(self.search_history)} searches",
+                text=f"{folder_text} • 🔍 {len(self.search_history)} searches",
                 font=ctk.CTkFont(size=12),
                 text_color="gray"
             )
             stats_label.pack()
 
     def on_search_input_change(self, event):
-        # Auto-complete or suggestions could be implemented here
-        pass
+        # Search as you type, once the keyboard has been idle for INSTANT_SEARCH_DELAY_MS
+        if not INSTANT_SEARCH or event.keysym in ("Return", "KP_Enter"):
+            return
+        if self.instant_search_job is not None:
+            self.after_cancel(self.instant_search_job)
+        self.instant_search_job = self.after(INSTANT_SEARCH_DELAY_MS, self.start_instant_search)
+
+    def start_instant_search(self):
+        self.instant_search_job = None
+        prompt = self.search_entry.get().strip()
+        # Only against an index already in memory, never while a full search or indexing runs
+        if self.loading or self.indexing or self.running or not self.folder_path:
+            return
+        if len(prompt) < INSTANT_SEARCH_MIN_CHARS or prompt == self.instant_prompt:
+            return
+        self.instant_prompt = prompt
+        self.search_generation += 1
+        generation = self.search_generation
+        threading.Thread(
+            target=lambda: self.instant_search(self.folder_path, prompt, generation),
+            daemon=True
+        ).start()
+
+    def instant_search(self, folder_path, prompt, generation):
+        # Prompts typed before are served from the prompt cache without encoding,
+        # and refresh=False scores the in-memory index without rescanning the folder
+        try:
+            start_time = time.time()
+            results = self.engine.search(
+                prompt,
+                int(self.results_slider.get()),
+                threshold=self.threshold_slider.get(),
+                folder_path=folder_path,
+                refresh=False,
+                cancelled=lambda: generation != self.search_generation
+            )
+            search_time = time.time() - start_time
+            self.after(0, lambda: self.show_instant_results(results, search_time, prompt, generation))
+        except SearchCancelled:
+            pass
+        except Exception as e:
+            print(f"Error in instant search: {e}")
+
+    def show_instant_results(self, results, search_time, prompt, generation):
+        if generation != self.search_generation:
+            return
+        if not results or not self.current_results or not self.results_view.winfo_manager():
+            self.show_search_results(results, search_time, prompt, generation)
+            return
+        # Update the cards in place, keeping the scroll position
+        self.current_results = results
+        self.results_title.configure(text=f"🖼️ Found {len(results)} matches for '{prompt}'")
+        self.display_results_in_mode(results, self.view_mode.get().lower(), incremental=True)
+        self.status_label.configure(
+            text=f"⚡ Live results: {len(results)} in {search_time * 1000:.0f} ms • "
+                 f"🎯 Best match: {results[0][1]:.3f}"
+        )
+        self.update_cache_status()
 
     def use_suggestion(self, suggestion):
         self.search_entry.delete(0, "end")
@@ -471,10 +593,34 @@ class ImageSearchApp(ctk.CTk):
                 self.grid_columnconfigure(0, weight=0, minsize=350)
 
     def initialize_model(self):
-        time.sleep(2)  # Simulate model loading
+        try:
+            load_time = self.engine.load_model()
+        except Exception as e:
+            error_msg = f"Failed to load AI model: {str(e)}"
+            self.after(0, lambda: self.model_failed(error_msg))
+            return
+        
         self.loading = False
+        self.log_startup(f"model ready (load took {load_time:.2f}s)")
         self.after(0, self.model_loaded)
 
+        # Warm the prompt cache so the canned suggestions never wait on the text encoder
+        if self.engine.prompt_cache is not None:
+            try:
+                self.engine.encode_texts(SEARCH_SUGGESTIONS)
+            except Exception as e:
+                print(f"Error warming prompt cache: {e}")
+
+    def model_failed(self, error_msg):
+        self.model_status.configure(
+            text="❌ AI Model Failed",
+            text_color=self.colors['danger']
+        )
+        self.status_label.configure(text=error_msg)
+
+    def log_startup(self, event):
+        print(f"[startup] {event} after {time.perf_counter() - APP_START:.2f}s")
+
     def model_loaded(self):
         self.model_status.configure(
             text="✅ AI Model Ready",
@@ -486,6 +632,10 @@ class ImageSearchApp(ctk.CTk):
         folder_path = filedialog.askdirectory(title="Select Image Folder")
         if folder_path:
             self.folder_path = folder_path
+            self.folder_stats = None
+            if self.folder_watcher is not None:
+                self.folder_watcher.stop()
+                self.folder_watcher = None
             
             # Update UI
             self.folder_display.configure(state="normal")
@@ -507,12 +657,25 @@ class ImageSearchApp(ctk.CTk):
             
             self.update_header_stats()
             self.status_label.configure(text=f"Folder selected: {os.path.basename(folder_path)}")
+            
+            # Bring the embedding index up to date before the first search
+            self.indexing = True
+            self.start_progress()
+            threading.Thread(
+                target=lambda: self.index_folder(folder_path),
+                daemon=True
+            ).start()
 
     def start_search(self):
-        if self.running or self.loading:
+        # A search already in flight is pre-empted rather than waited for
+        if self.loading:
             return
             
         prompt = self.search_entry.get().strip()
+        if self.instant_search_job is not None:
+            self.after_cancel(self.instant_search_job)
+            self.instant_search_job = None
+        self.instant_prompt = prompt
         
         if not self.folder_path:
             CTkMessagebox(
@@ -537,19 +700,17 @@ class ImageSearchApp(ctk.CTk):
                 self.search_history.pop(0)
             self.update_search_history()
         
+        self.search_generation += 1
+        generation = self.search_generation
         self.running = True
-        self.progress.pack(pady=10, fill='x')
-        self.progress.start()
+        self.start_progress()
         
-        self.search_btn.configure(
-            text="🔄 Searching...",
-            state="disabled"
-        )
+        self.search_btn.configure(text="🔄 Searching...")
         
         self.status_label.configure(text=f"Searching for: {prompt}")
         
         threading.Thread(
-            target=lambda: self.search_images(self.folder_path, prompt),
+            target=lambda: self.search_images(self.folder_path, prompt, generation),
             daemon=True
         ).start()
 
@@ -562,41 +723,34 @@ class ImageSearchApp(ctk.CTk):
         
         self.history_listbox.configure(state="disabled")
 
-    def search_images(self, folder_path, prompt):
+    def search_images(self, folder_path, prompt, generation):
+        def superseded():
+            return generation != self.search_generation
+
         try:
             start_time = time.time()
             
-            # Update status
-            self.after(0, lambda: self.status_label.configure(text="Loading images..."))
-            images = load_images(folder_path)
-            
-            self.after(0, lambda: self.status_label.configure(text="Encoding search query..."))
-            text_features = encode_text(prompt, self.model, self.device)
-            
-            self.after(0, lambda: self.status_label.configure(text="Analyzing images..."))
-            results = []
-            threshold = self.threshold_slider.get()
-            
-            for i, (img_path, img) in enumerate(images):
-                img_features = encode_image(img, self.preprocess, self.model, self.device)
-                similarity = (text_features @ img_features.T).item()
-                
-                if similarity >= threshold:
-                    results.append((img_path, similarity))
-                
-                # Update progress
-                progress_text = f"Processed {i+1}/{len(images)} images..."
-                self.after(0, lambda t=progress_text: self.status_label.configure(text=t))
-            
-            results.sort(key=lambda x: x[1], reverse=True)
-            final_results = results[:int(self.results_slider.get())]
+            final_results = self.engine.search(
+                prompt,
+                int(self.results_slider.get()),
+                threshold=self.threshold_slider.get(),
+                folder_path=folder_path,
+                status=lambda text: None if superseded() else self.set_status_async(text),
+                # A running folder watcher already keeps the index current, skip the rescan
+                refresh=self.folder_watcher is None or not self.folder_watcher.active,
+                cancelled=superseded
+            )
             
             search_time = time.time() - start_time
-            self.current_results = final_results
             
-            self.after(0, lambda: self.show_search_results(final_results, search_time, prompt))
+            self.after(0, lambda: self.show_search_results(final_results, search_time, prompt, generation))
             
+        except SearchCancelled:
+            pass
         except Exception as e:
+            if superseded():
+                return
+
             error_msg = f"Search failed: {str(e)}"
             self.after(0, lambda: CTkMessagebox(
                 title="Search Error",
@@ -605,14 +759,127 @@ class ImageSearchApp(ctk.CTk):
             ))
             self.after(0, lambda: self.status_label.configure(text=error_msg))
         finally:
-            self.after(0, self.reset_search_ui)
+            self.after(0, lambda: self.reset_search_ui(generation))
+
+    def start_progress(self):
+        # Indeterminate until the engine reports a known amount of work, then polled
+        self.progress.pack(pady=10, fill='x')
+        self.progress.configure(mode="indeterminate")
+        self.progress.start()
+        self.progress_determinate = False
+        if not self.progress_polling:
+            self.progress_polling = True
+            self.after(PROGRESS_POLL_MS, self.poll_progress)
+
+    def poll_progress(self):
+        snapshot = self.engine.progress.snapshot()
+        if snapshot["active"] and snapshot["total"]:
+            if not self.progress_determinate:
+                self.progress.stop()
+                self.progress.configure(mode="determinate")
+                self.progress_determinate = True
+            self.progress.set(snapshot["done"] / snapshot["total"])
+            self.status_label.configure(
+                text=f"{snapshot['label']} {snapshot['done']}/{snapshot['total']} images • "
+                     f"{snapshot['rate']:.1f} img/s • ETA {format_eta(snapshot['eta'])}"
+            )
+        elif self.progress_determinate:
+            self.progress.configure(mode="indeterminate")
+            self.progress.start()
+            self.progress_determinate = False
+
+        if self.running or self.indexing:
+            self.after(PROGRESS_POLL_MS, self.poll_progress)
+        else:
+            self.progress_polling = False
+
+    def stop_progress(self):
+        if self.running or self.indexing:
+            return
+        self.progress.stop()
+        self.progress.pack_forget()
+
+    def set_status_async(self, text):
+        # Safe to call from worker threads
+        self.after(0, lambda: self.status_label.configure(text=text))
+
+    def index_folder(self, folder_path):
+        try:
+            # Counts from the last run's manifest while the folder is checked for changes
+            self.refresh_folder_stats(folder_path)
+            summary = self.engine.index_summary(folder_path, status=self.set_status_async)
+            self.refresh_folder_stats(folder_path)
+            self.after(0, lambda: self.watch_folder(folder_path))
+            status_text = (
+                f"Index ready: {summary['images']} images "
+                f"({summary['added']} added, {summary['modified']} modified, {summary['deleted']} removed)"
+            )
+            self.after(0, lambda: self.status_label.configure(text=status_text))
+        except Exception as e:
+            error_msg = f"Indexing failed: {str(e)}"
+            self.after(0, lambda: self.status_label.configure(text=error_msg))
+        finally:
+            self.after(0, self.indexing_done)
 
-    def show_search_results(self, results, search_time, prompt):
+    def refresh_folder_stats(self, folder_path):
+        # Call from a worker thread
+        try:
+            stats = self.engine.folder_stats(folder_path)
+        except Exception as e:
+            print(f"Error reading folder stats: {e}")
+            return
+        self.after(0, lambda: self.show_folder_stats(folder_path, stats))
+
+    def show_folder_stats(self, folder_path, stats):
+        if folder_path != self.folder_path:
+            return
+        self.folder_stats = stats
+        self.update_header_stats()
+
+    def watch_folder(self, folder_path):
+        # Keep the open folder's index current as files are added, changed or removed
+        if folder_path != self.folder_path:
+            return
+        if self.folder_watcher is not None:
+            self.folder_watcher.stop()
+        self.folder_watcher = FolderWatcher(
+            folder_path, SUPPORTED_FORMATS,
+            on_change=lambda paths: self.on_folder_changed(folder_path, paths),
+            scan_options=getattr(self.engine, "scan_options", None)
+        ).start()
+
+    def on_folder_changed(self, folder_path, paths):
+        # Runs on the watcher's thread, only the changed files are re-encoded
+        if folder_path != self.folder_path:
+            return
+        changes = self.engine.update_files(folder_path, paths)
+        if changes and any(changes.values()):
+            status_text = (
+                f"🔄 Index updated: {changes['added']} added, {changes['modified']} modified, "
+                f"{changes['deleted']} removed"
+            )
+            self.after(0, lambda: self.status_label.configure(text=status_text))
+            self.refresh_folder_stats(folder_path)
+
+    def indexing_done(self):
+        self.indexing = False
+        self.stop_progress()
+
+    def show_search_results(self, results, search_time, prompt, generation=None):
+        if generation is not None and generation != self.search_generation:
+            # A newer search has started since, never show stale results
+            return
+        self.current_results = results
+        if not self.first_search_logged:
+            self.first_search_logged = True
+            self.log_startup("first search results")
+        
         # Clear previous results
         for widget in self.results_scrollable.winfo_children():
             widget.destroy()
         
         if not results:
+            self.show_results_view(False)
             self.show_no_results()
             return
         
@@ -622,198 +889,276 @@ class ImageSearchApp(ctk.CTk):
         )
         
         # Display results based on view mode
+        self.show_results_view(True)
         view_mode = self.view_mode.get().lower()
         self.display_results_in_mode(results, view_mode)
         
-        # Add search statistics
-        stats_frame = ctk.CTkFrame(self.results_scrollable, corner_radius=10)
-        stats_frame.pack(pady=20, padx=10, fill="x")
-        
-        stats_text = f"⏱️ Search completed in {search_time:.2f}s • 🎯 Best match: {results[0][1]:.3f}"
-        ctk.CTkLabel(
-            stats_frame,
-            text=stats_text,
-            font=ctk.CTkFont(size=12),
-            text_color="gray"
-        ).pack(pady=10)
-        
-        self.status_label.configure(text=f"Search completed: {len(results)} results in {search_time:.2f}s")
+        # Search statistics
+        self.status_label.configure(
+            text=f"⏱️ Search completed: {len(results)} results in {search_time:.2f}s • "
+                 f"🎯 Best match: {results[0][1]:.3f}"
+        )
+        self.update_cache_status()
+
+    def show_results_view(self, show):
+        # Results go in the virtual view, messages in the scrollable frame
+        if show:
+            self.results_scrollable.grid_remove()
+            self.results_view.grid()
+        else:
+            self.results_view.grid_remove()
+            self.results_view.clear()
+            self.results_scrollable.grid()
+
+    def update_cache_status(self):
+        if self.engine.prompt_cache is not None:
+            self.cache_status.configure(text=self.engine.prompt_cache.stats_text())
+
+    def on_close(self):
+        if self.folder_watcher is not None:
+            self.folder_watcher.stop()
+        try:
+            self.engine.close()
+        except Exception as e:
+            print(f"Error saving caches: {e}")
+        self.destroy()
 
-    def display_results_in_mode(self, results, mode):
+    def display_results_in_mode(self, results, mode, incremental=False):
+        # Thumbnails still loading for an earlier rendering are dropped when they arrive.
+        # An incremental update keeps them, its unchanged cards are still waiting for them.
+        if not incremental:
+            self.render_generation += 1
+            self.pending_thumbnails = 0
+            if self.stall_monitor is not None:
+                self.stall_monitor.reset()
         if mode == "grid":
-            self.display_grid_results(results)
+            self.display_grid_results(results, incremental)
         elif mode == "list":
-            self.display_list_results(results)
+            self.display_list_results(results, incremental)
         else:  # detailed
-            self.display_detailed_results(results)
+            self.display_detailed_results(results, incremental)
+        if self.pending_thumbnails == 0:
+            self.report_stall("render results")
 
-    def display_grid_results(self, results):
+    def set_thumbnail(self, label, img_path, size, on_ready=None):
+        # Show the thumbnail if it's in memory, otherwise a placeholder until a worker has loaded it.
+        # on_ready(original_size) runs once the real thumbnail is in place.
+        label.thumbnail_path = img_path
+        entry = self.thumbnails.peek(img_path, size)
+        if entry is None and not ASYNC_THUMBNAILS:
+            try:
+                entry = self.thumbnails.get(img_path, size)
+            except Exception as e:
+                print(f"Error loading thumbnail {img_path}: {e}")
+                label.configure(image=None, text=f"❌ Error loading image\n{os.path.basename(img_path)}")
+                return
+        if entry is not None:
+            label.configure(image=entry[0])
+            if on_ready:
+                on_ready(entry[1])
+            return
+
+        label.configure(image=self.get_placeholder(size))
+        generation = self.render_generation
+        self.pending_thumbnails += 1
+        future = self.thumbnail_pool.submit(self.thumbnails.load, img_path, size)
+        future.add_done_callback(lambda f: self.after(
+            0, lambda: self.thumbnail_loaded(f, generation, label, img_path, size, on_ready)
+        ))
+
+    def thumbnail_loaded(self, future, generation, label, img_path, size, on_ready):
+        try:
+            img, original_size = future.result()
+            entry = self.thumbnails.add(img_path, size, img, original_size)
+        except Exception as e:
+            print(f"Error loading thumbnail {img_path}: {e}")
+            entry = None
+
+        if generation != self.render_generation:
+            return
+        # Recycled cards may have moved on to another result in the meantime
+        if label.winfo_exists() and label.thumbnail_path == img_path:
+            if entry is not None:
+                label.configure(image=entry[0])
+                if on_ready:
+                    on_ready(entry[1])
+            else:
+                label.configure(image=None, text=f"❌ Error loading image\n{os.path.basename(img_path)}")
+        self.pending_thumbnails -= 1
+        if self.pending_thumbnails == 0:
+            self.report_stall("render results")
+
+    def get_placeholder(self, size):
+        if size not in self.placeholders:
+            self.placeholders[size] = ctk.CTkImage(Image.new("RGB", (size, size), "#3a3a3a"), size=(size, size))
+        return self.placeholders[size]
+
+    def report_stall(self, label):
+        if self.stall_monitor is not None:
+            self.stall_monitor.report(label)
+
+    def display_grid_results(self, results, incremental=False):
         # Calculate columns based on window width
         window_width = self.winfo_width()
         cols = max(2, min(4, (window_width - 400) // 300))
-        
-        for i, (img_path, score) in enumerate(results):
-            row = i // cols
-            col = i % cols
-            
-            # Create image card
-            card = self.create_image_card(img_path, score, size=(280, 280))
-            card.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-            
-            # Configure grid weights
-            self.results_scrollable.grid_columnconfigure(col, weight=1)
+        self.results_view.set_items(
+            results, self.build_grid_card, self.bind_image_card, columns=cols, row_height=GRID_ROW_HEIGHT,
+            keep_position=incremental
+        )
+
+    def display_list_results(self, results, incremental=False):
+        self.results_view.set_items(
+            results, self.build_list_card, self.bind_image_card, row_height=LIST_ROW_HEIGHT,
+            keep_position=incremental
+        )
 
-    def display_list_results(self, results):
-        for i, (img_path, score) in enumerate(results):
-            card = self.create_image_card(img_path, score, size=(100, 100), horizontal=True)
-            card.pack(pady=5, padx=10, fill="x")
+    def display_detailed_results(self, results, incremental=False):
+        self.results_view.set_items(
+            results, self.build_detailed_card, self.bind_detailed_card, row_height=DETAILED_ROW_HEIGHT,
+            keep_position=incremental
+        )
 
-    def display_detailed_results(self, results):
-        for i, (img_path, score) in enumerate(results):
-            card = self.create_detailed_card(img_path, score)
-            card.pack(pady=10, padx=10, fill="x")
+    # Result cards are built empty by the virtual results view and re-bound to
+    # whichever result scrolls into their slot
 
-    def create_image_card(self, img_path, score, size=(280, 280), horizontal=False):
-        card = ctk.CTkFrame(self.results_scrollable, corner_radius=15)
-        
-        try:
-            # Load and process image
-            img = Image.open(img_path)
-            img = ImageOps.fit(img, size, Image.Resampling.LANCZOS)
-            img_tk = ctk.CTkImage(img, size=size)
+    def build_grid_card(self, parent):
+        return self.build_image_card(parent, size=(280, 280))
+
+    def build_list_card(self, parent):
+        return self.build_image_card(parent, size=(100, 100), horizontal=True)
+
+    def build_image_card(self, parent, size=(280, 280), horizontal=False):
+        card = ctk.CTkFrame(parent, corner_radius=15)
+        card.img_path = None
+        card.thumbnail_size = size[0]
+        
+        if horizontal:
+            # Horizontal layout for list view
+            card.grid_columnconfigure(1, weight=1)
             
-            if horizontal:
-                # Horizontal layout for list view
-                card.grid_columnconfigure(1, weight=1)
-                
-                img_label = ctk.CTkLabel(card, image=img_tk, text="")
-                img_label.grid(row=0, column=0, padx=15, pady=15, sticky="w")
-                
-                info_frame = ctk.CTkFrame(card, fg_color="transparent")
-                info_frame.grid(row=0, column=1, padx=15, pady=15, sticky="ew")
-                
-                self.add_image_info(info_frame, img_path, score)
-                self.add_action_buttons(info_frame, img_path, horizontal=True)
-            else:
-                # Vertical layout for grid view
-                img_label = ctk.CTkLabel(card, image=img_tk, text="")
-                img_label.pack(padx=15, pady=(15, 5))
-                
-                info_frame = ctk.CTkFrame(card, fg_color="transparent")
-                info_frame.pack(padx=15, pady=(0, 15), fill="x")
-                
-                self.add_image_info(info_frame, img_path, score)
-                self.add_action_buttons(info_frame, img_path)
+            card.img_label = ctk.CTkLabel(card, text="")
+            card.img_label.grid(row=0, column=0, padx=15, pady=15, sticky="w")
             
-            # Hover effects
-            self.add_hover_effects(card, img_label)
+            info_frame = ctk.CTkFrame(card, fg_color="transparent")
+            info_frame.grid(row=0, column=1, padx=15, pady=15, sticky="ew")
             
-        except Exception as e:
-            # Error card
-            error_label = ctk.CTkLabel(
-                card,
-                text=f"❌ Error loading image\n{os.path.basename(img_path)}",
-                font=ctk.CTkFont(size=12)
-            )
-            error_label.pack(pady=20)
+            self.add_image_info(info_frame, card)
+            self.add_action_buttons(info_frame, card, horizontal=True)
+        else:
+            # Vertical layout for grid view
+            card.img_label = ctk.CTkLabel(card, text="")
+            card.img_label.pack(padx=15, pady=(15, 5))
+            
+            info_frame = ctk.CTkFrame(card, fg_color="transparent")
+            info_frame.pack(padx=15, pady=(0, 15), fill="x")
+            
+            self.add_image_info(info_frame, card)
+            self.add_action_buttons(info_frame, card)
         
+        # Hover effects
+        self.add_hover_effects(card, card.img_label)
         return card
 
-    def create_detailed_card(self, img_path, score):
-        card = ctk.CTkFrame(self.results_scrollable, corner_radius=15)
+    def bind_image_card(self, card, result):
+        img_path, score = result
+        card.img_path = img_path
+        card.name_label.configure(text=os.path.basename(img_path))
+        card.score_label.configure(text=f"🎯 {score:.3f}", text_color=self.get_score_color(score))
+        card.img_label.configure(text="")
+        self.set_thumbnail(card.img_label, img_path, card.thumbnail_size)
+
+    def build_detailed_card(self, parent):
+        card = ctk.CTkFrame(parent, corner_radius=15)
+        card.img_path = None
         
-        try:
-            # Get image info
-            img = Image.open(img_path)
-            width, height = img.size
-            file_size = os.path.getsize(img_path)
-            
-            # Thumbnail
-            thumb = ImageOps.fit(img, (150, 150), Image.Resampling.LANCZOS)
-            img_tk = ctk.CTkImage(thumb, size=(150, 150))
-            
-            # Layout
-            main_frame = ctk.CTkFrame(card, fg_color="transparent")
-            main_frame.pack(padx=20, pady=20, fill="x")
-            main_frame.grid_columnconfigure(1, weight=1)
-            
-            # Image thumbnail
-            img_label = ctk.CTkLabel(main_frame, image=img_tk, text="")
-            img_label.grid(row=0, column=0, padx=(0, 20), sticky="nw")
-            
-            # Detailed info
-            info_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
-            info_frame.grid(row=0, column=1, sticky="ew")
-            
-            # File name
-            name_label = ctk.CTkLabel(
-                info_frame,
-                text=os.path.basename(img_path),
-                font=ctk.CTkFont(size=16, weight="bold")
-            )
-            name_label.pack(anchor="w", pady=(0, 5))
-            
-            # Similarity score
-            score_label = ctk.CTkLabel(
-                info_frame,
-                text=f"🎯 Similarity: {score:.3f}",
-                font=ctk.CTkFont(size=14),
-                text_color=self.get_score_color(score)
-            )
-            score_label.pack(anchor="w", pady=2)
-            
-            # Image dimensions
-            dims_label = ctk.CTkLabel(
-                info_frame,
-                text=f"📐 Dimensions: {width}x{height}",
-                font=ctk.CTkFont(size=12),
-                text_color="gray"
-            )
-            dims_label.pack(anchor="w", pady=2)
-            
-            # File size
-            size_label = ctk.CTkLabel(
-                info_frame,
-                text=f"💾 Size: {self.format_file_size(file_size)}",
-                font=ctk.CTkFont(size=12),
-                text_color="gray"
-            )
-            size_label.pack(anchor="w", pady=2)
-            
-            # Action buttons
-            self.add_action_buttons(info_frame, img_path, detailed=True)
-            
-        except Exception as e:
-            error_label = ctk.CTkLabel(
-                card,
-                text=f"❌ Error loading detailed view: {str(e)}",
-                font=ctk.CTkFont(size=12)
-            )
-            error_label.pack(pady=20)
+        # Layout
+        main_frame = ctk.CTkFrame(card, fg_color="transparent")
+        main_frame.pack(padx=20, pady=20, fill="x")
+        main_frame.grid_columnconfigure(1, weight=1)
+        
+        # Image thumbnail
+        card.img_label = ctk.CTkLabel(main_frame, text="")
+        card.img_label.grid(row=0, column=0, padx=(0, 20), sticky="nw")
+        
+        # Detailed info
+        info_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        info_frame.grid(row=0, column=1, sticky="ew")
+        
+        # File name
+        card.name_label = ctk.CTkLabel(
+            info_frame,
+            text="",
+            font=ctk.CTkFont(size=16, weight="bold")
+        )
+        card.name_label.pack(anchor="w", pady=(0, 5))
+        
+        # Similarity score
+        card.score_label = ctk.CTkLabel(
+            info_frame,
+            text="",
+            font=ctk.CTkFont(size=14)
+        )
+        card.score_label.pack(anchor="w", pady=2)
         
+        # Image dimensions
+        card.dims_label = ctk.CTkLabel(
+            info_frame,
+            text="",
+            font=ctk.CTkFont(size=12),
+            text_color="gray"
+        )
+        card.dims_label.pack(anchor="w", pady=2)
+        
+        # File size
+        card.size_label = ctk.CTkLabel(
+            info_frame,
+            text="",
+            font=ctk.CTkFont(size=12),
+            text_color="gray"
+        )
+        card.size_label.pack(anchor="w", pady=2)
+        
+        # Action buttons
+        self.add_action_buttons(info_frame, card, detailed=True)
         return card
 
-    def add_image_info(self, parent, img_path, score):
+    def bind_detailed_card(self, card, result):
+        img_path, score = result
+        card.img_path = img_path
+        card.name_label.configure(text=os.path.basename(img_path))
+        card.score_label.configure(text=f"🎯 Similarity: {score:.3f}", text_color=self.get_score_color(score))
+        card.dims_label.configure(text="📐 Dimensions: …")
+        try:
+            card.size_label.configure(text=f"💾 Size: {self.format_file_size(os.path.getsize(img_path))}")
+        except OSError:
+            card.size_label.configure(text="💾 Size: unknown")
+        card.img_label.configure(text="")
+        
+        # Thumbnail and original dimensions both come from the thumbnail cache
+        self.set_thumbnail(
+            card.img_label, img_path, 150,
+            on_ready=lambda dims: card.dims_label.configure(text=f"📐 Dimensions: {dims[0]}x{dims[1]}")
+        )
+
+    def add_image_info(self, parent, card):
         # File name
-        name_label = ctk.CTkLabel(
+        card.name_label = ctk.CTkLabel(
             parent,
-            text=os.path.basename(img_path),
+            text="",
             font=ctk.CTkFont(size=12, weight="bold"),
             wraplength=200
         )
-        name_label.pack(pady=(0, 5))
+        card.name_label.pack(pady=(0, 5))
         
-        # Score with color coding
-        score_color = self.get_score_color(score)
-        score_label = ctk.CTkLabel(
+        # Score, color coded when bound
+        card.score_label = ctk.CTkLabel(
             parent,
-            text=f"🎯 {score:.3f}",
-            font=ctk.CTkFont(size=11),
-            text_color=score_color
+            text="",
+            font=ctk.CTkFont(size=11)
         )
-        score_label.pack()
+        card.score_label.pack()
 
-    def add_action_buttons(self, parent, img_path, horizontal=False, detailed=False):
+    def add_action_buttons(self, parent, card, horizontal=False, detailed=False):
         if detailed:
             button_frame = ctk.CTkFrame(parent, fg_color="transparent")
             button_frame.pack(pady=(10, 0), fill="x")
@@ -827,7 +1172,7 @@ class ImageSearchApp(ctk.CTk):
             text="💾" if not detailed else "💾 Save",
             width=35 if not detailed else 80,
             height=25,
-            command=lambda: self.save_image(img_path),
+            command=lambda: self.save_image(card.img_path),
             font=ctk.CTkFont(size=10)
         )
         save_btn.pack(side="left", padx=(0, 5))
@@ -838,7 +1183,7 @@ class ImageSearchApp(ctk.CTk):
             text="👁️" if not detailed else "👁️ View",
             width=35 if not detailed else 80,
             height=25,
-            command=lambda: self.view_image(img_path),
+            command=lambda: self.view_image(card.img_path),
             font=ctk.CTkFont(size=10)
         )
         view_btn.pack(side="left", padx=2)
@@ -859,11 +1204,12 @@ class ImageSearchApp(ctk.CTk):
         img_label.bind("<Button-1>", on_click)
 
     def get_score_color(self, score):
-        if score > 0.8:
+        # Bands on the cosine similarity scale of normalized CLIP embeddings
+        if score > 0.32:
             return self.colors['success']
-        elif score > 0.6:
+        elif score > 0.27:
             return self.colors['accent']
-        elif score > 0.4:
+        elif score > 0.22:
             return self.colors['warning']
         else:
             return self.colors['danger']
@@ -1002,7 +1348,9 @@ class ImageSearchApp(ctk.CTk):
             widget.destroy()
         
         self.current_results = []
+        self.instant_prompt = None
         self.results_title.configure(text="🖼️ Search Results")
+        self.show_results_view(False)
         self.show_welcome_message()
         
         CTkMessagebox(
@@ -1011,10 +1359,11 @@ class ImageSearchApp(ctk.CTk):
             icon="info"
         )
 
-    def reset_search_ui(self):
-        self.progress.stop()
-        self.progress.pack_forget()
+    def reset_search_ui(self, generation=None):
+        if generation is not None and generation != self.search_generation:
+            return
         self.running = False
+        self.stop_progress()
         
         self.search_btn.configure(
             text="🚀 Search Images",
@@ -1023,30 +1372,30 @@ class ImageSearchApp(ctk.CTk):
 
 
 # Helper functions (keep these outside the class)
-def load_images(folder_path):
-    images = []
-    supported_formats = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif')
-    
-    for file in os.listdir(folder_path):
-        if file.lower().endswith(supported_formats):
-            image_path = os.path.join(folder_path, file)
-            try:
-                img = Image.open(image_path).convert("RGB")
-                images.append((image_path, img))
-            except Exception as e:
-                print(f"Error loading {image_path}: {e}")
-    
-    return images
+PROGRESS_POLL_MS = 100
+
+# Fixed row heights of the virtual results view, per view mode
+GRID_ROW_HEIGHT = 420
+LIST_ROW_HEIGHT = 160
+DETAILED_ROW_HEIGHT = 230
+
+# EDAI_ASYNC_THUMBNAILS=0 restores synchronous thumbnail loading, e.g. to compare stall times
+ASYNC_THUMBNAILS = os.environ.get("EDAI_ASYNC_THUMBNAILS", "1") != "0"
+
+# Search as you type: idle time after the last key before searching, and the
+# shortest prompt worth searching for
+INSTANT_SEARCH = os.environ.get("EDAI_INSTANT_SEARCH", "1") != "0"
+INSTANT_SEARCH_DELAY_MS = int(os.environ.get("EDAI_INSTANT_SEARCH_DELAY_MS", 250))
+INSTANT_SEARCH_MIN_CHARS = 3
 
-def encode_text(prompt, model, device):
-    text_tokens = open_clip.tokenize([prompt]).to(device)
-    with torch.no_grad():
-        return model.encode_text(text_tokens).cpu().numpy()
+SEARCH_SUGGESTIONS = [
+    "a cat sleeping", "beautiful sunset", "modern architecture",
+    "people laughing", "colorful flowers", "vintage car",
+    "mountain landscape", "abstract art", "food photography"
+]
 
-def encode_image(image, preprocess, model, device):
-    img_tensor = preprocess(image).unsqueeze(0).to(device)
-    with torch.no_grad():
-        return model.encode_image(img_tensor).cpu().numpy()
+# Same set as the CLI and search server, whose index is keyed on it
+SUPPORTED_FORMATS = IMAGE_EXTENSIONS
 
 
 if __name__ == "__main__":
@@ -0,0 +1,610 @@
+import os
+import io
+import json
+import contextlib
+import hashlib
+import numpy as np
+from ann import create_ann_index, search_batch, ExactSearch, IVFFlatSearch, EXACT_SEARCH_LIMIT
+from quantization import create_codec, QuantizedSearch, DEFAULT_RERANK
+from folder_scan import scan_images, image_matches, DEFAULT_SCAN_OPTIONS
+
+# On-disk embedding store for a single image folder.
+#
+# Each indexed folder gets its own directory under the cache dir holding
+#   embeddings.npy  - float32 matrix of L2-normalized features, one row per image
+#   manifest.json   - image paths with the mtime/size/content hash they were encoded at
+#   ann.npz         - trained IVF lists or quantized codes, when either is in use;
+#                     kept up to date as rows are added and deleted, not retrained
+# so that a search only has to encode the prompt and do one matrix product, and
+# a rescan only has to encode files that were added or actually changed.
+#
+# Rows never move between saves: new images are appended to embeddings.npy in
+# place, and deleted ones are left in it as tombstones (null in the manifest) that
+# search skips, until enough of the file is dead that save() compacts it.
+#
+# The embedding matrix is memory-mapped read-only rather than read into RAM, so
+# opening even a multi-GB index is near-instant, pages are loaded on demand as
+# the chunked scoring touches them, and several app instances on one machine
+# share the same page cache.  With quantization enabled only the compressed
+# codes are held in RAM and full-precision rows are read just to re-rank.
+
+INDEX_VERSION = 4
+# Version 3 manifests are version 4 without tombstones
+READABLE_VERSIONS = (3, 4)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif')
+DEFAULT_CACHE_DIR = os.environ.get(
+    "EDAI_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "edai_image_search")
+)
+# "none", "float16", "int8" or "pq", see quantization.py
+DEFAULT_QUANTIZATION = os.environ.get("EDAI_QUANTIZATION", "none")
+# Share of tombstoned rows above which save() rewrites embeddings.npy without them
+COMPACT_FRACTION = 0.25
+COPY_CHUNK = 65536
+# Entries of a saved ANN state with one element per row
+PER_ROW_ANN_STATE = ("assignments", "codes")
+
+
+def index_dir_for(folder_path, cache_dir=None):
+    key = hashlib.sha1(os.path.abspath(folder_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, key)
+
+
+def scan_folder(folder_path, extensions=IMAGE_EXTENSIONS, scan_options=None):
+    # path -> (mtime, size) for every supported image in the folder, see folder_scan.py
+    return scan_images(folder_path, extensions, **(scan_options or DEFAULT_SCAN_OPTIONS))
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_embeddings(path):
+    # Memory-mapped read-only; some numpy versions refuse to map a zero-row matrix,
+    # which is still a valid index (e.g. a folder of only undecodable files)
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        embeddings = np.load(path)
+        if embeddings.size:
+            raise
+        return embeddings
+
+
+def append_embeddings(path, rows, start):
+    # Write rows into the .npy matrix at path right after its first `start` rows (dropping
+    # any past them) and grow the shape in its header in place, without reading the rest.
+    # False if the file can't be extended that way; the caller then rewrites it.
+    rows = np.ascontiguousarray(rows, dtype=np.float32)
+    with open(path, "r+b") as f:
+        if np.lib.format.read_magic(f) != (1, 0):
+            return False
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        offset = f.tell()
+        if (fortran_order or dtype != np.float32 or len(shape) != 2
+                or shape[1] != rows.shape[1] or start > shape[0]):
+            return False
+        # np.save leaves room in the header for the row count to grow
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (start + len(rows), shape[1]),
+        })
+        if len(header.getvalue()) != offset:
+            return False
+
+        # Rows first, so a crash before the header is rewritten leaves the old matrix intact
+        f.seek(offset + start * rows.shape[1] * rows.itemsize)
+        f.write(rows.tobytes())
+        if start + len(rows) < shape[0]:
+            f.truncate()
+        f.flush()
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
+
+
+def normalize_query(text_features):
+    # Scores against the unit-norm index are cosine similarities only for a unit-norm query
+    query = np.asarray(text_features, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(query)
+    return query / norm if norm > 0 else query
+
+
+class EmbeddingIndex:
+    def __init__(self, folder_path, model_name="ViT-B-32", pretrained="laion2b_s34b_b79k",
+                 extensions=IMAGE_EXTENSIONS, cache_dir=None, ann_backend="auto", ann_params=None,
+                 quantization=DEFAULT_QUANTIZATION, rerank=DEFAULT_RERANK, scan_options=None):
+        self.folder_path = folder_path
+        self.model_name = model_name
+        self.pretrained = pretrained
+        self.extensions = tuple(extensions)
+        self.scan_options = scan_options or DEFAULT_SCAN_OPTIONS
+        self.index_dir = index_dir_for(folder_path, cache_dir)
+
+        # One entry per row of embeddings, None for a deleted row (a tombstone)
+        self.paths = []
+        self.stats = []
+        self.hashes = []
+        self.tombstones = 0
+        # Files that exist but couldn't be decoded -> (mtime, size), not retried until they change
+        self.skipped = {}
+        # Files refresh() returned that have no vector yet -> (mtime, size).  Never saved, so
+        # whatever add() doesn't get to (cancelled, crashed) is simply found again next refresh.
+        self.pending = {}
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.last_changes = {"added": 0, "modified": 0, "deleted": 0, "renamed": 0}
+
+        self.ann_backend = ann_backend
+        self.ann_params = ann_params or {}
+        self.quantization = quantization
+        self.rerank = rerank
+        self.ann = None
+        # Saved IVF or codec state to restore self.ann from; may predate rows added or
+        # deleted since, which restoring catches up on
+        self._ann_state = None
+        # Fingerprint ann.npz was written for
+        self._ann_saved = None
+        self._fingerprint = None
+        # False while the manifest on disk matches the in-memory index
+        self.unsaved = True
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.index_dir, "manifest.json")
+
+    @property
+    def embeddings_path(self):
+        return os.path.join(self.index_dir, "embeddings.npy")
+
+    @property
+    def ann_path(self):
+        return os.path.join(self.index_dir, "ann.npz")
+
+    def __len__(self):
+        return len(self.paths) - self.tombstones
+
+    def read_manifest(self):
+        # The saved manifest if it was written for this model and extension set, else None
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (manifest.get("version") not in READABLE_VERSIONS
+                or manifest.get("model") != self.model_name
+                or manifest.get("pretrained") != self.pretrained
+                or tuple(manifest.get("extensions", ())) != self.extensions):
+            return None
+        return manifest
+
+    def load(self):
+        manifest = self.read_manifest()
+        if manifest is None:
+            return False
+        try:
+            embeddings = load_embeddings(self.embeddings_path)
+        except (OSError, ValueError):
+            return False
+        files = manifest.get("files", [])
+        if len(files) > len(embeddings):
+            return False
+        # Rows past the manifest were appended by a save that never finished
+        embeddings = embeddings[:len(files)]
+
+        self.paths = [entry["path"] if entry else None for entry in files]
+        self.stats = [(entry["mtime"], entry["size"]) if entry else None for entry in files]
+        self.hashes = [entry["hash"] if entry else None for entry in files]
+        self.tombstones = self.paths.count(None)
+        self.skipped = {path: tuple(stat) for path, stat in manifest.get("skipped", {}).items()}
+        self.pending = {}
+        self.embeddings = embeddings.astype(np.float32, copy=False)
+        self.ann = None
+        self._fingerprint = None
+        self._ann_state = self._load_ann_state()
+        self._ann_saved = self.fingerprint() if self._ann_state is not None else None
+        self.unsaved = False
+        return True
+
+    def fingerprint(self):
+        # Identity of the indexed content, changes whenever any row does.
+        # Memoized until the next change, so it doubles as a cheap index version.
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for img_path, file_digest in zip(self.paths, self.hashes):
+                if img_path is None:
+                    # Tombstones still hold a row, and saved ANN state is per row
+                    digest.update(b"\0")
+                    continue
+                digest.update(img_path.encode("utf-8"))
+                digest.update(file_digest.encode("ascii"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def _ann_kind(self):
+        return self.quantization if self.quantization != "none" else "ivf"
+
+    def _load_ann_state(self):
+        try:
+            with np.load(self.ann_path) as data:
+                if (str(data["fingerprint"]) != self.fingerprint()
+                        or str(data["kind"]) != self._ann_kind()):
+                    return None
+                return {key: data[key] for key in data.files if key not in ("fingerprint", "kind")}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        # add() appends to the file in place, so it is only written in full the first
+        # time or to compact away tombstones
+        tmp_embeddings = None
+        if not self._embeddings_on_disk() or self.tombstones > COMPACT_FRACTION * len(self.paths):
+            tmp_embeddings = self._write_compacted()
+
+        manifest = {
+            "version": INDEX_VERSION,
+            "folder": os.path.abspath(self.folder_path),
+            "model": self.model_name,
+            "pretrained": self.pretrained,
+            "extensions": list(self.extensions),
+            "files": [
+                {"path": path, "mtime": stat[0], "size": stat[1], "hash": digest} if path is not None else None
+                for path, stat, digest in zip(self.paths, self.stats, self.hashes)
+            ],
+            "skipped": {path: list(stat) for path, stat in self.skipped.items()},
+        }
+
+        # Write to temp files first so a crash never leaves a half-written index
+        tmp_manifest = self.manifest_path + ".tmp"
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        if tmp_embeddings is not None:
+            os.replace(tmp_embeddings, self.embeddings_path)
+        os.replace(tmp_manifest, self.manifest_path)
+        self.unsaved = False
+
+        if tmp_embeddings is not None:
+            # Swap the in-memory matrix for a mapping of the file just written
+            self.embeddings = load_embeddings(self.embeddings_path)
+            if self.ann is not None and hasattr(self.ann, "vectors"):
+                self.ann.vectors = self.embeddings
+
+        # Keep ann.npz in step with the manifest just written
+        if self.ann is None and self._ann_state is not None:
+            self.get_ann()
+        elif not self._save_ann() and os.path.exists(self.ann_path):
+            os.remove(self.ann_path)
+
+    def _write_compacted(self):
+        # Write the live rows to a temp file and drop the tombstones, returns its path.
+        # Copied in chunks so a large memory-mapped matrix is never read into RAM at once.
+        live = np.asarray([row for row, path in enumerate(self.paths) if path is not None], dtype=np.int64)
+        dim = self.embeddings.shape[1] if self.embeddings.ndim == 2 else 0
+        tmp_embeddings = self.embeddings_path + ".tmp.npy"
+        if len(live) and dim:
+            out = np.lib.format.open_memmap(tmp_embeddings, mode="w+", dtype=np.float32, shape=(len(live), dim))
+            for start in range(0, len(live), COPY_CHUNK):
+                out[start:start + COPY_CHUNK] = self.embeddings[live[start:start + COPY_CHUNK]]
+            out.flush()
+            del out
+        else:
+            np.save(tmp_embeddings, np.zeros((0, dim), dtype=np.float32))
+
+        if self.tombstones:
+            self.paths = [self.paths[row] for row in live]
+            self.stats = [self.stats[row] for row in live]
+            self.hashes = [self.hashes[row] for row in live]
+            self.tombstones = 0
+            # Row ids shift, carry the search structure's per-row state over to them
+            ann_state = self._ann_state if self.ann is None else self._live_ann_state()
+            self._invalidate_ann()
+            if ann_state is not None:
+                self._ann_state = {
+                    key: value[live[live < len(value)]] if key in PER_ROW_ANN_STATE else value
+                    for key, value in ann_state.items()
+                }
+        return tmp_embeddings
+
+    def _indexed(self):
+        # path -> (mtime, size) of every file with a vector
+        return {path: stat for path, stat in zip(self.paths, self.stats) if path is not None}
+
+    def _delete(self, row):
+        self.paths[row] = None
+        self.stats[row] = None
+        self.hashes[row] = None
+        self.tombstones += 1
+
+    def _live_ann_state(self):
+        # State of self.ann worth saving, None for structures that are rebuilt instead
+        if isinstance(self.ann, IVFFlatSearch):
+            return self.ann.state()
+        if isinstance(self.ann, QuantizedSearch):
+            return self.ann.codec.state()
+        return None
+
+    def _save_ann(self):
+        # Write the search structure's state next to the embeddings unless it is
+        # already there, True if it has one
+        ann_state = self._live_ann_state()
+        if ann_state is None:
+            return False
+        if self._ann_saved != self.fingerprint():
+            tmp_ann = self.ann_path + ".tmp.npz"
+            np.savez(tmp_ann, fingerprint=self.fingerprint(), kind=self._ann_kind(), **ann_state)
+            os.replace(tmp_ann, self.ann_path)
+            self._ann_saved = self.fingerprint()
+        self._ann_state = ann_state
+        return True
+
+    def _embeddings_on_disk(self):
+        # True while self.embeddings is still the unmodified mapping of embeddings.npy
+        filename = getattr(self.embeddings, "filename", None)
+        return filename is not None and os.path.abspath(filename) == os.path.abspath(self.embeddings_path)
+
+    def is_stale(self, current=None):
+        # current: a current_files() scan to check against instead of scanning again
+        if current is None:
+            current = self.current_files()
+        indexed = self._indexed()
+        indexed.update(self.skipped)
+        return current != indexed
+
+    def current_files(self, changed=None):
+        # path -> (mtime, size) of the folder's images.  With changed, only those paths
+        # are stat'ed and everything else is assumed to be as indexed, which is what
+        # lets a file watcher update a large folder without rescanning it.
+        if changed is None:
+            return scan_folder(self.folder_path, self.extensions, self.scan_options)
+        current = self._indexed()
+        current.update(self.skipped)
+        current.update(self.pending)
+        for img_path in changed:
+            current.pop(img_path, None)
+            if not image_matches(self.folder_path, img_path, self.extensions, **self.scan_options):
+                continue
+            try:
+                st = os.stat(img_path)
+            except OSError:
+                continue
+            current[img_path] = (st.st_mtime, st.st_size)
+        return current
+
+    def folder_stats(self, manifest=None):
+        # Image counts, overall and per subfolder ("." for the top level), of the index in
+        # memory or of a manifest from read_manifest() without loading the index
+        if manifest is None:
+            paths, skipped = [path for path in self.paths if path is not None], len(self.skipped)
+        else:
+            paths = [entry["path"] for entry in manifest["files"] if entry]
+            skipped = len(manifest.get("skipped", {}))
+        folders = {}
+        for img_path in paths:
+            folder = os.path.relpath(os.path.dirname(img_path), self.folder_path)
+            folders[folder] = folders.get(folder, 0) + 1
+        return {"folder": self.folder_path, "images": len(paths), "skipped": skipped, "folders": folders}
+
+    def refresh(self, changed=None, current=None):
+        # Reconcile the index with the folder and return the paths that need encoding.
+        # Unchanged files keep their vectors, deleted files become tombstones, and files whose
+        # stat changed but whose content hash didn't (touch, copy, rename) are not re-encoded.
+        # changed limits the check to those paths, see current_files(); current reuses
+        # a scan the caller already made, e.g. for is_stale().
+        if current is None:
+            current = self.current_files(changed)
+        changes = {"added": 0, "modified": 0, "deleted": 0, "renamed": 0}
+        tombstones = self.tombstones
+        touched = False
+
+        indexed = set(self.paths)
+        vanished = {}  # content hash -> row of files no longer at their old path
+        dropped = []
+        pending = {}
+
+        for row, img_path in enumerate(self.paths):
+            if img_path is None:
+                continue
+            stat = current.get(img_path)
+            if stat is None:
+                # Deleted unless a new path below turns out to be a rename of it
+                vanished[self.hashes[row]] = row
+                changes["deleted"] += 1
+                dropped.append(row)
+                self._delete(row)
+                continue
+            if stat != self.stats[row]:
+                try:
+                    digest = file_hash(img_path)
+                except OSError:
+                    digest = None
+                if digest != self.hashes[row]:
+                    changes["modified"] += 1
+                    pending[img_path] = stat
+                    dropped.append(row)
+                    self._delete(row)
+                    continue
+                self.stats[row] = stat
+                touched = True
+
+        skipped = {}
+        for img_path, stat in current.items():
+            if img_path in indexed:
+                continue
+            if self.skipped.get(img_path) == stat:
+                # Known undecodable file, don't retry until it changes
+                skipped[img_path] = stat
+                continue
+            if not vanished:
+                # Nothing it could be a rename of; add() hashes it once encoded
+                changes["added"] += 1
+                pending[img_path] = stat
+                continue
+            try:
+                digest = file_hash(img_path)
+            except OSError:
+                continue
+            row = vanished.pop(digest, None)
+            if row is not None:
+                # Same content under a new path, the row keeps its vector
+                changes["renamed"] += 1
+                changes["deleted"] -= 1
+                self.paths[row] = img_path
+                self.stats[row] = stat
+                self.hashes[row] = digest
+                self.tombstones -= 1
+            else:
+                changes["added"] += 1
+                pending[img_path] = stat
+
+        if touched or self.tombstones != tombstones or any(changes.values()) or skipped != self.skipped:
+            self.unsaved = True
+        self.skipped = skipped
+        self.pending = pending
+        self.last_changes = changes
+        if any(changes.values()):
+            self._update_ann(removed=[row for row in dropped if self.paths[row] is None])
+        return list(pending)
+
+    def add(self, encoded_batches, lock=None):
+        # encoded_batches: (paths, (n, D) features) pairs for the paths refresh() returned.
+        # lock, if given, is held only while the new rows are swapped in, not while
+        # encoded_batches is consumed, so searches can go on while images encode.
+        # If encoding fails partway, the rows encoded so far are still added and the
+        # rest stay pending.
+        new_rows, paths, stats, hashes = [], [], [], []
+        try:
+            for batch_paths, features in encoded_batches:
+                features = np.asarray(features, dtype=np.float32)
+                for img_path, vector in zip(batch_paths, features):
+                    if img_path not in self.pending:
+                        continue
+                    try:
+                        digest = file_hash(img_path)
+                    except OSError:
+                        continue
+                    new_rows.append(vector)
+                    paths.append(img_path)
+                    stats.append(self.pending.pop(img_path))
+                    hashes.append(digest)
+        finally:
+            if new_rows:
+                with lock or contextlib.nullcontext():
+                    self._append(np.vstack(new_rows), paths, stats, hashes)
+        return len(new_rows)
+
+    def _append(self, new_rows, paths, stats, hashes):
+        if self._embeddings_on_disk() and append_embeddings(self.embeddings_path, new_rows, len(self.embeddings)):
+            # Appended to the file in place; the manifest follows in save()
+            self.embeddings = load_embeddings(self.embeddings_path)
+        elif len(self.embeddings):
+            self.embeddings = np.vstack([self.embeddings, new_rows])
+        else:
+            self.embeddings = new_rows
+        self.paths.extend(paths)
+        self.stats.extend(stats)
+        self.hashes.extend(hashes)
+        self.unsaved = True
+        self._update_ann()
+
+    def mark_undecodable(self, paths):
+        # Pending paths the decoder gave up on; skipped until the file changes
+        for img_path in paths:
+            stat = self.pending.pop(img_path, None)
+            if stat is not None:
+                self.skipped[img_path] = stat
+                self.unsaved = True
+
+    def _invalidate_ann(self):
+        self.ann = None
+        self._ann_state = None
+        self._fingerprint = None
+
+    def _update_ann(self, removed=None):
+        # Apply appended rows and deleted ones to the search structure in place rather
+        # than rebuilding it; once that has skewed it too far it is retrained on next use
+        self._fingerprint = None
+        if self.ann is None:
+            # Restoring _ann_state catches up on the changes
+            return
+        self.ann.extend(self.embeddings)
+        if removed:
+            self.ann.remove(removed)
+        if self._ann_outgrown():
+            self._invalidate_ann()
+
+    def _ann_outgrown(self):
+        # IVF lists skewed by incremental updates, or brute force over a folder grown past it
+        if isinstance(self.ann, IVFFlatSearch):
+            return not self.ann.balanced()
+        if isinstance(self.ann, ExactSearch):
+            return self.ann_backend != "exact" and len(self.embeddings) >= EXACT_SEARCH_LIMIT
+        return False
+
+    def _remove_tombstones(self, ann):
+        if self.tombstones:
+            ann.remove([row for row, path in enumerate(self.paths) if path is None])
+        return ann
+
+    def _restore_ann(self):
+        # self.ann from the saved state, caught up with rows added and deleted since
+        if self.quantization != "none":
+            codec = create_codec(self.quantization, state=self._ann_state)
+            ann = QuantizedSearch(self.embeddings, codec, self.rerank)
+        else:
+            ann = IVFFlatSearch(self.embeddings, **self.ann_params, **self._ann_state)
+        ann.extend(self.embeddings)
+        return self._remove_tombstones(ann)
+
+    def _build_ann(self):
+        if self.quantization != "none":
+            codec = create_codec(self.quantization, self.embeddings)
+            ann = QuantizedSearch(self.embeddings, codec, self.rerank)
+        else:
+            # "auto" means the NumPy IVF here: its lists are saved and updated in place,
+            # whereas faiss and hnswlib indexes would be rebuilt every session
+            backend = "ivf" if self.ann_backend == "auto" else self.ann_backend
+            ann = create_ann_index(self.embeddings, backend, **self.ann_params)
+        self._ann_saved = None
+        return self._remove_tombstones(ann)
+
+    def get_ann(self):
+        # Build (or restore) the search structure lazily on first search; after that
+        # refresh() and add() keep it current
+        if self.ann is None:
+            if self._ann_state is not None:
+                self.ann = self._restore_ann()
+                if self.ann is not None and self._ann_outgrown():
+                    self.ann = None
+            if self.ann is None:
+                self.ann = self._build_ann()
+            # Unless save() is still to come, keep what was trained for the next session
+            if self._embeddings_on_disk() and not self.unsaved:
+                self._save_ann()
+        return self.ann
+
+    def search(self, text_features, k, threshold=None):
+        # Top-k (path, score) pairs scoring >= threshold, best first.
+        # Only these k rows are ever turned into Python objects.
+        if not len(self):
+            return []
+        query = normalize_query(text_features)
+        ids, scores = self.get_ann().search(query, k, threshold)
+        return [(self.paths[i], score) for i, score in zip(ids.tolist(), scores.tolist())]
+
+    def search_batch(self, text_features, k, threshold=None):
+        # One result list per row of (Q, D) text_features, scored together
+        if not len(self):
+            return [[] for _ in range(len(text_features))]
+        queries = np.asarray(text_features, dtype=np.float32).reshape(len(text_features), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1.0)
+        return [
+            [(self.paths[i], score) for i, score in zip(ids.tolist(), scores.tolist())]
+            for ids, scores in search_batch(self.get_ann(), queries, k, threshold)
+        ]
@@ -0,0 +1,132 @@
+import os
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Image discovery for indexing.
+#
+# Folders are walked with os.scandir, so the file type of every entry comes from
+# the directory listing itself and only matching images (and directories, to
+# detect loops) are stat'ed.  Nested folders such as year/month/day archives are
+# included by default.
+#
+#   recursive - descend into subfolders
+#   include   - globs an image must match, e.g. ["2023/*", "*.jpg"]; all images if empty
+#   exclude   - globs of images or folders to leave out, e.g. [".thumbnails", "*/raw/*"]
+#   workers   - threads listing directories concurrently; helps on network mounts
+#               where every listing is a round trip, 0 walks in this thread
+#
+# Globs are matched against both the entry name and its path relative to the
+# root, with "/" as the separator on every platform.  Symlinked folders are
+# followed, but a folder already visited (by any path) is never walked twice.
+
+
+def parse_globs(value):
+    # "a,b" or a list -> list of non-empty globs
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [glob.strip() for glob in value if glob.strip()]
+
+
+DEFAULT_SCAN_OPTIONS = {
+    "recursive": os.environ.get("EDAI_RECURSIVE", "1") != "0",
+    "include": parse_globs(os.environ.get("EDAI_INCLUDE", "")),
+    "exclude": parse_globs(os.environ.get("EDAI_EXCLUDE", "")),
+    "workers": int(os.environ.get("EDAI_SCAN_WORKERS", 0)),
+}
+
+
+def _matches(name, rel_path, globs):
+    return any(fnmatch.fnmatch(name, glob) or fnmatch.fnmatch(rel_path, glob) for glob in globs)
+
+
+def _list_dir(path, rel_dir, extensions, include, exclude, recursive):
+    # ([(path, (mtime, size))], [(path, rel path, (st_dev, st_ino))]) for one directory
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError as e:
+        print(f"Error scanning {path}: {e}")
+        return files, dirs
+
+    for entry in entries:
+        rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+        if exclude and _matches(entry.name, rel_path, exclude):
+            continue
+        try:
+            if entry.is_dir():
+                if recursive:
+                    st = entry.stat()
+                    dirs.append((entry.path, rel_path, (st.st_dev, st.st_ino)))
+            elif entry.name.lower().endswith(extensions) and entry.is_file():
+                if include and not _matches(entry.name, rel_path, include):
+                    continue
+                st = entry.stat()
+                files.append((entry.path, (st.st_mtime, st.st_size)))
+        except OSError:
+            continue
+    return files, dirs
+
+
+def iter_images(root, extensions, recursive=True, include=None, exclude=None, workers=0):
+    # Yields (path, (mtime, size)) for every matching image under root, a directory at a time
+    extensions = tuple(ext.lower() for ext in extensions)
+    include, exclude = parse_globs(include), parse_globs(exclude)
+    try:
+        st = os.stat(root)
+    except OSError as e:
+        print(f"Error scanning {root}: {e}")
+        return
+    visited = {(st.st_dev, st.st_ino)}
+
+    def new_dirs(dirs):
+        # Drop folders already seen, which is what breaks symlink loops
+        fresh = []
+        for path, rel_path, key in dirs:
+            if key not in visited:
+                visited.add(key)
+                fresh.append((path, rel_path))
+        return fresh
+
+    args = (extensions, include, exclude, recursive)
+    if workers <= 0:
+        stack = [(root, "")]
+        while stack:
+            files, dirs = _list_dir(*stack.pop(), *args)
+            yield from files
+            stack.extend(reversed(new_dirs(dirs)))
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(_list_dir, root, "", *args)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, dirs = future.result()
+                for path, rel_path in new_dirs(dirs):
+                    pending.add(executor.submit(_list_dir, path, rel_path, *args))
+                yield from files
+
+
+def image_matches(root, path, extensions, recursive=True, include=None, exclude=None, workers=0):
+    # Whether iter_images(root, ...) would list path, without touching the filesystem;
+    # used to filter change notifications
+    rel_path = os.path.relpath(path, root).replace(os.sep, "/")
+    parts = rel_path.split("/")
+    if parts[0] in ("..", ".") or (not recursive and len(parts) > 1):
+        return False
+    if not parts[-1].lower().endswith(tuple(ext.lower() for ext in extensions)):
+        return False
+    exclude = parse_globs(exclude)
+    for depth in range(len(parts)):
+        if exclude and _matches(parts[depth], "/".join(parts[:depth + 1]), exclude):
+            return False
+    include = parse_globs(include)
+    return not include or _matches(parts[-1], rel_path, include)
+
+
+def scan_images(root, extensions, **options):
+    # path -> (mtime, size) for every matching image under root
+    return dict(iter_images(root, extensions, **options))
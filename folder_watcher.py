@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+from folder_scan import image_matches, DEFAULT_SCAN_OPTIONS
+from embedding_index import scan_folder
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# Keeps an indexed folder's index current while an app has it open.
+#
+# Changes come from watchdog (inotify, FSEvents, ReadDirectoryChangesW) when it
+# is installed, otherwise from rescanning the folder every EDAI_WATCH_POLL_SECONDS.
+# Changed image paths are collected until the folder has been quiet for
+# `settle` seconds and then handed to on_change(paths) on the watcher's thread,
+# typically SearchEngine.update_files so only those files are re-encoded.
+# on_change(None) means "rescan everything", e.g. after a whole subfolder moved.
+#
+#   EDAI_WATCHER=auto|watchdog|poll|off
+
+WATCHER_BACKEND = os.environ.get("EDAI_WATCHER", "auto")
+DEFAULT_POLL_INTERVAL = float(os.environ.get("EDAI_WATCH_POLL_SECONDS", 30))
+DEFAULT_SETTLE = 1.0
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        if event.is_directory:
+            # Files inside a moved or deleted folder get no events of their own
+            if event.event_type in ("moved", "deleted"):
+                self.watcher.queue(None)
+            return
+        paths = [event.src_path]
+        if getattr(event, "dest_path", None):
+            paths.append(event.dest_path)
+        self.watcher.queue(paths)
+
+
+class FolderWatcher:
+    def __init__(self, folder_path, extensions, on_change, scan_options=None,
+                 backend=WATCHER_BACKEND, poll_interval=DEFAULT_POLL_INTERVAL, settle=DEFAULT_SETTLE):
+        self.folder_path = folder_path
+        self.extensions = tuple(extensions)
+        self.on_change = on_change
+        self.scan_options = scan_options or DEFAULT_SCAN_OPTIONS
+        self.poll_interval = poll_interval
+        self.settle = settle
+        if backend == "auto":
+            backend = "watchdog" if Observer is not None else "poll"
+        if backend == "watchdog" and Observer is None:
+            print("Error starting folder watcher: watchdog is not installed, polling instead")
+            backend = "poll"
+        self.backend = backend
+
+        self.lock = threading.Lock()
+        self.changed = set()
+        self.rescan = False
+        self.last_event = 0.0
+        self.stopped = threading.Event()
+        self.observer = None
+        self.thread = None
+
+    def start(self):
+        if self.backend == "off":
+            return self
+        if self.backend == "watchdog":
+            self.observer = Observer()
+            self.observer.schedule(
+                _EventHandler(self), self.folder_path, recursive=self.scan_options.get("recursive", True)
+            )
+            self.observer.daemon = True
+            self.observer.start()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    @property
+    def active(self):
+        # True while changes are actually being watched (not with backend "off" or once stopped)
+        return self.thread is not None and self.thread.is_alive() and not self.stopped.is_set()
+
+    def stop(self):
+        self.stopped.set()
+        if self.observer is not None:
+            self.observer.stop()
+
+    def queue(self, paths):
+        # Safe from any thread; paths None asks for a full rescan
+        if paths is not None:
+            paths = [path for path in paths
+                     if image_matches(self.folder_path, path, self.extensions, **self.scan_options)]
+            if not paths:
+                return
+        with self.lock:
+            if paths is None:
+                self.rescan = True
+            else:
+                self.changed.update(paths)
+            self.last_event = time.monotonic()
+
+    def _scan(self):
+        return scan_folder(self.folder_path, self.extensions, self.scan_options)
+
+    def _run(self):
+        snapshot = self._scan() if self.backend == "poll" else None
+        next_poll = time.monotonic() + self.poll_interval
+        while not self.stopped.wait(min(self.settle, 0.25)):
+            now = time.monotonic()
+            if snapshot is not None and now >= next_poll:
+                current = self._scan()
+                self.queue([path for path in current.keys() | snapshot.keys()
+                            if current.get(path) != snapshot.get(path)])
+                snapshot = current
+                next_poll = time.monotonic() + self.poll_interval
+
+            with self.lock:
+                if not (self.changed or self.rescan) or now - self.last_event < self.settle:
+                    continue
+                paths = None if self.rescan else sorted(self.changed)
+                self.changed = set()
+                self.rescan = False
+            try:
+                self.on_change(paths)
+            except Exception as e:
+                print(f"Error updating index for {self.folder_path}: {e}")
@@ -0,0 +1,196 @@
+import os
+import math
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+from thumbnail_cache import make_thumbnails
+
+# Image loading and encoding helpers shared by both apps and the benchmarks.
+#
+# Indexing streams images through the pipeline one batch at a time:
+#   paths -> iter_preprocessed_batches -> encode_batches -> EmbeddingIndex.add
+# so only the current batch of preprocessed tensors (and a single full-size
+# decoded bitmap) is ever alive, no matter how large the folder is.
+#
+# With workers > 0, decoding and preprocessing run in a process pool and at most
+# workers + prefetch batches are in flight ahead of the encoder.
+#
+# torch is imported inside the functions that need it so importing this module
+# stays cheap for the apps' startup path.
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_WORKERS = int(os.environ.get("EDAI_DECODE_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+DEFAULT_PREFETCH = int(os.environ.get("EDAI_PREFETCH_BATCHES", 2))
+
+
+def model_input_size(model):
+    # Side length the model's preprocess resizes to, e.g. 224 for ViT-B-32
+    size = getattr(model.visual, "image_size", 224)
+    return max(size) if isinstance(size, (tuple, list)) else int(size)
+
+
+def load_image(image_path, min_size=None, with_size=False):
+    # Decode at the smallest scale whose shorter side still covers min_size.
+    # with_size=True also returns the original (width, height).
+    with Image.open(image_path) as img:
+        original_size = img.size
+        if min_size and img.format == "JPEG":
+            # libjpeg can scale by 1/2, 1/4 or 1/8 while decoding
+            scale = min_size / min(img.size)
+            if scale < 1:
+                img.draft("RGB", (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+        img = img.convert("RGB")
+
+    if min_size:
+        # Formats without a reduced decode still get a cheap box reduction before preprocess
+        factor = min(img.size) // min_size
+        if factor >= 2:
+            img = img.reduce(factor)
+    return (img, original_size) if with_size else img
+
+
+def preprocess_chunk(image_paths, preprocess, min_size=None, thumbnail_sizes=None):
+    # Decode and preprocess a list of paths, returns (paths, float32 array (n, 3, H, W), thumbnails).
+    # With thumbnail_sizes, thumbnails[i] is ((width, height), {size: JPEG bytes}) cut from the
+    # same decoded image, otherwise thumbnails is None.
+    paths, arrays, thumbnails = [], [], []
+    if thumbnail_sizes:
+        min_size = max(min_size or 0, *thumbnail_sizes)
+    for image_path in image_paths:
+        try:
+            img, original_size = load_image(image_path, min_size, with_size=True)
+            arrays.append(preprocess(img).numpy())
+            if thumbnail_sizes:
+                thumbnails.append((original_size, make_thumbnails(img, thumbnail_sizes)))
+        except Exception as e:
+            print(f"Error loading {image_path}: {e}")
+            continue
+        paths.append(image_path)
+    return paths, np.stack(arrays) if arrays else None, thumbnails if thumbnail_sizes else None
+
+
+# Set once per worker process so the transform isn't pickled with every task
+_worker_preprocess = None
+_worker_min_size = None
+_worker_thumbnail_sizes = None
+
+
+def _init_worker(preprocess, min_size, thumbnail_sizes=None):
+    global _worker_preprocess, _worker_min_size, _worker_thumbnail_sizes
+    _worker_preprocess = preprocess
+    _worker_min_size = min_size
+    _worker_thumbnail_sizes = thumbnail_sizes
+    # Each worker already runs on its own core
+    import torch
+    torch.set_num_threads(1)
+
+
+def _worker_preprocess_chunk(image_paths):
+    return preprocess_chunk(image_paths, _worker_preprocess, _worker_min_size, _worker_thumbnail_sizes)
+
+
+def iter_chunks(items, size):
+    # Lists of up to size items, pulled from any iterable only as they are needed
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _failed_paths(chunk, paths):
+    decoded = set(paths)
+    return [image_path for image_path in chunk if image_path not in decoded]
+
+
+def iter_preprocessed_batches(image_paths, preprocess, batch_size=DEFAULT_BATCH_SIZE,
+                              workers=0, prefetch=DEFAULT_PREFETCH, min_size=None,
+                              thumbnail_sizes=None, on_thumbnails=None, on_failed=None):
+    # Yields (paths, tensor of shape (n, 3, H, W)) in input order; undecodable files are skipped
+    # and, with on_failed, reported to on_failed(paths) in this process as each batch is decoded.
+    # image_paths may be a generator, e.g. a folder scan, and is consumed batch by batch.
+    # min_size enables reduced-resolution decoding, see load_image().
+    # With on_thumbnails, thumbnails are cut while each image is decoded anyway and
+    # handed to on_thumbnails(paths, thumbnails) in this process, batch by batch.
+    import torch
+    thumbnail_sizes = thumbnail_sizes if on_thumbnails else None
+    chunks = iter_chunks(image_paths, batch_size)
+    first = list(itertools.islice(chunks, 2))
+    chunks = itertools.chain(first, chunks)
+
+    if workers <= 0 or len(first) <= 1:
+        for chunk in chunks:
+            paths, array, thumbnails = preprocess_chunk(chunk, preprocess, min_size, thumbnail_sizes)
+            if on_failed and len(paths) < len(chunk):
+                on_failed(_failed_paths(chunk, paths))
+            if paths:
+                if thumbnails:
+                    on_thumbnails(paths, thumbnails)
+                yield paths, torch.from_numpy(array)
+        return
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(preprocess, min_size, thumbnail_sizes)
+    )
+    try:
+        pending = deque()
+        exhausted = False
+        while not exhausted or pending:
+            # Keep the queue topped up, but never more than workers + prefetch batches ahead
+            while not exhausted and len(pending) < workers + prefetch:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    pending.append((chunk, executor.submit(_worker_preprocess_chunk, chunk)))
+            if not pending:
+                break
+
+            chunk, future = pending.popleft()
+            paths, array, thumbnails = future.result()
+            if on_failed and len(paths) < len(chunk):
+                on_failed(_failed_paths(chunk, paths))
+            if paths:
+                if thumbnails:
+                    on_thumbnails(paths, thumbnails)
+                yield paths, torch.from_numpy(array)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def encode_batch(batch, model, device):
+    # Unit-norm features, so dot products against the index are cosine similarities
+    import torch
+    with torch.no_grad():
+        return model.encode_image(batch.to(device), normalize=True).cpu().numpy().astype(np.float32, copy=False)
+
+
+def encode_batches(batches, model, device):
+    # Yields (paths, (n, D) features) for each preprocessed batch
+    for paths, batch in batches:
+        yield paths, encode_batch(batch, model, device)
+
+
+def encode_image(image, preprocess, model, device):
+    import torch
+    img_tensor = preprocess(image).unsqueeze(0).to(device)
+    with torch.no_grad():
+        return model.encode_image(img_tensor, normalize=True).cpu().numpy()
+
+
+def encode_images(images, preprocess, model, device, batch_size=DEFAULT_BATCH_SIZE):
+    # Encode a list of PIL images with one forward pass per batch, returns (N, D) float32
+    import torch
+    features = []
+    for start in range(0, len(images), batch_size):
+        batch = torch.stack([preprocess(img) for img in images[start:start + batch_size]])
+        features.append(encode_batch(batch, model, device))
+
+    if not features:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.concatenate(features)
@@ -0,0 +1,63 @@
+import time
+import threading
+
+# Progress of long-running work, shared between a worker and the UI.
+#
+# Workers only update counters (cheap, no UI calls); the UI polls snapshot() at
+# its own fixed rate.  That keeps the Tk event queue free of per-image callbacks
+# however fast the worker goes.
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class Progress:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.label = ""
+        self.total = 0
+        self.done = 0
+        self.started = None
+        self.active = False
+
+    def start(self, total, label="Working"):
+        with self.lock:
+            self.label = label
+            self.total = total
+            self.done = 0
+            self.started = time.perf_counter()
+            self.active = True
+
+    def advance(self, count=1):
+        with self.lock:
+            self.done += count
+
+    def finish(self):
+        with self.lock:
+            self.active = False
+
+    def track(self, batches):
+        # Pass (paths, ...) batches through, counting their paths
+        for batch in batches:
+            yield batch
+            self.advance(len(batch[0]))
+
+    def snapshot(self):
+        # label, done, total, active, rate (items/s) and eta (s, None if unknown)
+        with self.lock:
+            elapsed = time.perf_counter() - self.started if self.started else 0.0
+            rate = self.done / elapsed if elapsed > 0 else 0.0
+            remaining = max(self.total - self.done, 0)
+            return {
+                "label": self.label,
+                "done": self.done,
+                "total": self.total,
+                "active": self.active,
+                "rate": rate,
+                "eta": remaining / rate if rate > 0 else None,
+            }
@@ -0,0 +1,89 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Size-bounded LRU of text-prompt embeddings, so repeated, history and suggested
+# prompts skip tokenization and the text tower.  Prompts are keyed after the same
+# lowercasing and whitespace cleanup the CLIP tokenizer applies, so "A Cat" and
+# "a  cat" share an entry.  With a path, the cache is saved as an .npz on close()
+# and reloaded next session; the file name carries the model so weights never mix.
+
+DEFAULT_PROMPT_CACHE_SIZE = int(os.environ.get("EDAI_PROMPT_CACHE_SIZE", "1024"))
+PERSIST_PROMPT_CACHE = os.environ.get("EDAI_PERSIST_PROMPTS", "1") != "0"
+
+
+def normalize_prompt(prompt):
+    return " ".join(prompt.lower().split())
+
+
+class PromptCache:
+    def __init__(self, max_entries=DEFAULT_PROMPT_CACHE_SIZE, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, prompt):
+        key = normalize_prompt(prompt)
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, prompt, vector):
+        if self.max_entries <= 0:
+            return
+        key = normalize_prompt(prompt)
+        with self.lock:
+            self.entries[key] = np.asarray(vector, dtype=np.float32).reshape(-1)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def stats_text(self):
+        total = self.hits + self.misses
+        rate = f" ({self.hits / total:.0%})" if total else ""
+        return f"🧠 Prompt cache: {self.hits} hits / {self.misses} misses{rate}"
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                prompts, vectors = data["prompts"].tolist(), data["vectors"]
+        except Exception as e:
+            print(f"Error loading prompt cache {self.path}: {e}")
+            return
+        with self.lock:
+            # Stored least recently used first
+            for prompt, vector in list(zip(prompts, vectors))[-self.max_entries:]:
+                self.entries[prompt] = vector
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        with self.lock:
+            prompts = list(self.entries)
+            vectors = np.stack(list(self.entries.values())) if prompts else np.zeros((0, 0), np.float32)
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp.npz"
+            np.savez(tmp_path, prompts=np.asarray(prompts, dtype=str), vectors=vectors)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving prompt cache {self.path}: {e}")
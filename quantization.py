@@ -0,0 +1,207 @@
+import numpy as np
+from ann import top_k, drop_removed, removed_mask
+
+# Compressed in-memory copies of the embedding matrix.
+#
+#   "float16" - half precision, 2 bytes per dimension
+#   "int8"    - symmetric per-dimension scalar quantization, 1 byte per dimension
+#   "pq"      - product quantization, 1 byte per subspace, scored with asymmetric
+#               distance computation (query kept in float32, lookup tables per subspace)
+#
+# QuantizedSearch scores every row against the compressed codes, then re-ranks the
+# best candidates against the full-precision vectors, which can stay on disk.
+# Codecs are trained once; rows added later are encoded with the same scale or
+# codebooks via extend().
+
+QUANTIZATION_MODES = ("none", "float16", "int8", "pq")
+DEFAULT_RERANK = 4
+SCORE_CHUNK = 8192
+
+
+class Float16Codec:
+    name = "float16"
+
+    def __init__(self, vectors=None, codes=None):
+        self.codes = codes if codes is not None else self.encode(vectors)
+
+    def encode(self, vectors):
+        return np.asarray(vectors, dtype=np.float16)
+
+    def extend(self, vectors):
+        self.codes = np.concatenate([self.codes, self.encode(vectors)])
+
+    def scores(self, query):
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_CHUNK):
+            out[start:start + SCORE_CHUNK] = self.codes[start:start + SCORE_CHUNK].astype(np.float32) @ query
+        return out
+
+    def state(self):
+        return {"codes": self.codes}
+
+
+class Int8Codec:
+    name = "int8"
+
+    def __init__(self, vectors=None, codes=None, scale=None):
+        if codes is None:
+            vectors = np.asarray(vectors, dtype=np.float32)
+            scale = np.maximum(np.abs(vectors).max(axis=0), 1e-12) / 127.0
+        self.scale = scale.astype(np.float32)
+        self.codes = codes if codes is not None else self.encode(vectors)
+
+    def encode(self, vectors):
+        # Rows outside the trained range are clipped, re-ranking absorbs the error
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, len(vectors), SCORE_CHUNK):
+            chunk = np.asarray(vectors[start:start + SCORE_CHUNK], dtype=np.float32) / self.scale
+            codes[start:start + SCORE_CHUNK] = np.clip(np.rint(chunk), -127, 127)
+        return codes
+
+    def extend(self, vectors):
+        self.codes = np.concatenate([self.codes, self.encode(vectors)])
+
+    def scores(self, query):
+        # Fold the per-dimension scale into the query instead of dequantizing rows
+        scaled_query = query * self.scale
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_CHUNK):
+            out[start:start + SCORE_CHUNK] = self.codes[start:start + SCORE_CHUNK].astype(np.float32) @ scaled_query
+        return out
+
+    def state(self):
+        return {"codes": self.codes, "scale": self.scale}
+
+
+def _kmeans(vectors, k, iterations=15, seed=0):
+    # Plain Euclidean k-means, used for the PQ sub-codebooks
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        distances = (vectors ** 2).sum(1)[:, None] - 2 * vectors @ centroids.T + (centroids ** 2).sum(1)[None, :]
+        assignments = np.argmin(distances, axis=1)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        for dim in range(vectors.shape[1]):
+            sums[:, dim] = np.bincount(assignments, weights=vectors[:, dim], minlength=k)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+            counts[empty] = 1
+        centroids = (sums / counts[:, None]).astype(np.float32)
+    return centroids
+
+
+class PQCodec:
+    name = "pq"
+
+    def __init__(self, vectors=None, codes=None, codebooks=None, trained_codes=None,
+                 subspaces=64, train_size=65536, seed=0):
+        if codes is None:
+            vectors = np.asarray(vectors, dtype=np.float32)
+            dim = vectors.shape[1]
+            if dim % subspaces:
+                raise ValueError(f"Dimension {dim} is not divisible into {subspaces} subspaces")
+            sub_dim = dim // subspaces
+
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(len(vectors), min(len(vectors), train_size), replace=False)]
+            codebooks = np.stack([
+                _kmeans(sample[:, j * sub_dim:(j + 1) * sub_dim], 256, seed=seed + j)
+                for j in range(subspaces)
+            ])
+            if codebooks.shape[1] < 256:
+                # Fewer training rows than codes, pad so codes stay uint8-addressable
+                pad = np.zeros((subspaces, 256 - codebooks.shape[1], sub_dim), dtype=np.float32)
+                codebooks = np.concatenate([codebooks, pad], axis=1)
+            trained_codes = min(256, len(sample))
+        # Codewords learned from data, the rest of each codebook is padding
+        self.trained_codes = int(trained_codes) if trained_codes is not None else 256
+        self.codebooks = codebooks
+        self.codes = codes if codes is not None else self.encode(vectors)
+
+    def encode(self, vectors):
+        # Nearest codeword per subspace, padding codewords excluded
+        subspaces, _, sub_dim = self.codebooks.shape
+        codes = np.empty((len(vectors), subspaces), dtype=np.uint8)
+        for j in range(subspaces):
+            book = self.codebooks[j, :self.trained_codes]
+            for start in range(0, len(vectors), SCORE_CHUNK):
+                sub = np.asarray(vectors[start:start + SCORE_CHUNK, j * sub_dim:(j + 1) * sub_dim], dtype=np.float32)
+                distances = -2 * sub @ book.T + (book ** 2).sum(1)[None, :]
+                codes[start:start + SCORE_CHUNK, j] = np.argmin(distances, axis=1)
+        return codes
+
+    def extend(self, vectors):
+        self.codes = np.concatenate([self.codes, self.encode(vectors)])
+
+    def scores(self, query):
+        # Asymmetric distance computation: one (subspaces, 256) table per query
+        subspaces, _, sub_dim = self.codebooks.shape
+        table = np.einsum("jcd,jd->jc", self.codebooks, query.reshape(subspaces, sub_dim))
+        out = np.empty(len(self.codes), dtype=np.float32)
+        rows = np.arange(subspaces)
+        for start in range(0, len(self.codes), SCORE_CHUNK):
+            out[start:start + SCORE_CHUNK] = table[rows, self.codes[start:start + SCORE_CHUNK]].sum(axis=1)
+        return out
+
+    def state(self):
+        return {"codes": self.codes, "codebooks": self.codebooks, "trained_codes": self.trained_codes}
+
+
+CODECS = {"float16": Float16Codec, "int8": Int8Codec, "pq": PQCodec}
+
+
+def create_codec(mode, vectors=None, state=None):
+    if mode not in CODECS:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    if state is not None:
+        return CODECS[mode](**state)
+    return CODECS[mode](vectors)
+
+
+class QuantizedSearch:
+    name = "quantized"
+
+    def __init__(self, vectors, codec, rerank=DEFAULT_RERANK):
+        # vectors: full-precision matrix, typically memory-mapped so it isn't held in RAM
+        self.vectors = vectors
+        self.codec = codec
+        self.rerank = rerank
+        self.removed = None
+
+    def __len__(self):
+        return len(self.codec.codes)
+
+    def remove(self, ids):
+        self.removed = removed_mask(self.removed, len(self.codec.codes), ids)
+
+    def extend(self, vectors):
+        # Only rows past the ones already encoded are encoded, with the trained codec
+        start = len(self.codec.codes)
+        self.vectors = vectors
+        if start < len(vectors):
+            self.codec.extend(vectors[start:])
+            if self.removed is not None:
+                self.removed = np.concatenate([self.removed, np.zeros(len(vectors) - start, dtype=bool)])
+
+    @property
+    def bytes_per_vector(self):
+        state = self.codec.state()
+        return sum(np.asarray(value).nbytes for value in state.values()) / max(len(self), 1)
+
+    def search(self, query, k, threshold=None, rerank=None):
+        rerank = rerank or self.rerank
+        scores = self.codec.scores(query)
+        if self.removed is not None:
+            scores[self.removed] = -np.inf
+        candidates, _ = drop_removed(*top_k(scores, max(k * rerank, k)))
+        if not len(candidates):
+            return candidates, np.zeros(0, dtype=np.float32)
+
+        # Sorted row order keeps reads from a memory-mapped matrix sequential
+        candidates = np.sort(candidates)
+        exact = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+        order, scores = top_k(exact, k, threshold)
+        return candidates[order], scores
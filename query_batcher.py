@@ -0,0 +1,86 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+# Coalesces concurrent text searches into micro-batches.
+#
+# Prompts arriving within max_wait seconds of the first one (up to max_batch of
+# them) go through the text tower in one encode_texts call, then each folder's
+# share of the batch is scored with a single (Q x D) . (D x N) product instead
+# of Q separate matrix-vector products.  A lone request pays at most max_wait
+# extra latency; under load the per-query cost drops with the batch size.
+
+DEFAULT_MAX_WAIT = float(os.environ.get("EDAI_BATCH_WAIT_MS", "5")) / 1000.0
+DEFAULT_MAX_BATCH = int(os.environ.get("EDAI_MAX_BATCH", "32"))
+
+
+class QueryBatcher:
+    def __init__(self, engine, max_wait=DEFAULT_MAX_WAIT, max_batch=DEFAULT_MAX_BATCH):
+        self.engine = engine
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.pending = queue.Queue()
+        self.batches = 0
+        self.queries = 0
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, prompt, k=8, threshold=None, folder_path=None):
+        future = Future()
+        self.pending.put((prompt, k, threshold, folder_path or self.engine.folder_path, future))
+        return future
+
+    def search(self, prompt, k=8, threshold=None, folder_path=None, timeout=None):
+        # Same results as engine.search(..., refresh=False), blocking until the batch is done
+        return self.submit(prompt, k, threshold, folder_path).result(timeout)
+
+    def _collect(self):
+        # Block for one request, then gather whatever else arrives within max_wait
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.pending.get(timeout=remaining) if remaining > 0 else self.pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _run_batch(self, batch):
+        features = self.engine.encode_texts([prompt for prompt, *_ in batch])
+        self.batches += 1
+        self.queries += len(batch)
+
+        by_folder = {}
+        for row, request in enumerate(batch):
+            by_folder.setdefault(request[3], []).append(row)
+
+        for folder_path, rows in by_folder.items():
+            requests = [batch[row] for row in rows]
+            try:
+                # Score once with the largest k and loosest threshold, then cut per request
+                k = max(request[1] for request in requests)
+                thresholds = [request[2] for request in requests]
+                threshold = None if None in thresholds else min(thresholds)
+                results = self.engine.search_features(features[rows], k, threshold, folder_path, refresh=False)
+            except Exception as e:
+                for *_, future in requests:
+                    future.set_exception(e)
+                continue
+
+            for (_, k, threshold, _, future), hits in zip(requests, results):
+                if threshold is not None:
+                    hits = [hit for hit in hits if hit[1] >= threshold]
+                future.set_result(hits[:k])
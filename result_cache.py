@@ -0,0 +1,78 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Ranked hits of recent searches, keyed by folder, index version (the index
+# fingerprint) and a hash of the prompt embedding.  Each entry keeps the top
+# `depth` hits with no threshold applied, so a repeated search with a different
+# result count or threshold is a slice: the top k above a threshold are exactly
+# the first k cached hits filtered by it, for any k <= depth.  Entries for a
+# folder are dropped as soon as a search sees a new version of its index.
+
+DEFAULT_RESULT_CACHE_SIZE = int(os.environ.get("EDAI_RESULT_CACHE_SIZE", "64"))
+DEFAULT_RESULT_DEPTH = int(os.environ.get("EDAI_RESULT_DEPTH", "256"))
+
+
+def embedding_key(text_features):
+    vector = np.ascontiguousarray(text_features, dtype=np.float32).reshape(-1)
+    return hashlib.blake2b(vector.tobytes(), digest_size=16).hexdigest()
+
+
+def cut(hits, k, threshold=None):
+    # Top k of a best-first hit list, then the ones scoring >= threshold
+    hits = hits[:k]
+    if threshold is not None:
+        hits = [hit for hit in hits if hit[1] >= threshold]
+    return hits
+
+
+class ResultCache:
+    def __init__(self, max_entries=DEFAULT_RESULT_CACHE_SIZE, depth=DEFAULT_RESULT_DEPTH):
+        self.max_entries = max_entries
+        self.depth = depth
+        self.entries = OrderedDict()
+        self.versions = {}  # folder -> index version the cached entries belong to
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, folder_path, version, text_features, k, threshold=None):
+        # Top-k hits >= threshold from the cache, or None if they have to be searched
+        key = (folder_path, version, embedding_key(text_features))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or k > entry["depth"]:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return cut(entry["hits"], k, threshold)
+
+    def put(self, folder_path, version, text_features, hits, depth):
+        # hits: the top `depth` (path, score) pairs with no threshold applied
+        if self.max_entries <= 0:
+            return
+        key = (folder_path, version, embedding_key(text_features))
+        with self.lock:
+            if self.versions.get(folder_path) != version:
+                self._drop_folder(folder_path)
+                self.versions[folder_path] = version
+            self.entries[key] = {"hits": hits, "depth": depth}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, folder_path=None):
+        with self.lock:
+            if folder_path is None:
+                self.entries.clear()
+                self.versions.clear()
+            else:
+                self._drop_folder(folder_path)
+                self.versions.pop(folder_path, None)
+
+    def _drop_folder(self, folder_path):
+        for key in [key for key in self.entries if key[0] == folder_path]:
+            del self.entries[key]
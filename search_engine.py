@@ -0,0 +1,382 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import threading
+import numpy as np
+from embedding_index import EmbeddingIndex, IMAGE_EXTENSIONS, DEFAULT_QUANTIZATION, DEFAULT_CACHE_DIR
+from folder_scan import DEFAULT_SCAN_OPTIONS
+from image_pipeline import (
+    iter_preprocessed_batches, encode_batches, model_input_size,
+    DEFAULT_BATCH_SIZE, DEFAULT_WORKERS, DEFAULT_PREFETCH
+)
+from clip_model import load_clip_model, MODEL_NAME, PRETRAINED
+from prompt_cache import PromptCache, DEFAULT_PROMPT_CACHE_SIZE, PERSIST_PROMPT_CACHE
+from result_cache import ResultCache, cut
+from thumbnail_cache import ThumbnailStore, THUMBNAIL_SIZES, GENERATE_THUMBNAILS
+from progress import Progress
+
+# UI-independent indexing and search.
+#
+#   engine = SearchEngine()
+#   engine.index("/photos")
+#   engine.search("a cat sleeping", k=10, threshold=0.2)
+#
+# Both desktop apps are front-ends over this class, and the same calls are
+# available from the command line for batch jobs:
+#
+#   python search_engine.py index /photos
+#   python search_engine.py search /photos "a cat sleeping" -k 10 --format csv
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+def until_cancelled(batches, cancelled):
+    # Pass batches through until cancelled() turns true at a batch boundary, then
+    # close the source so its decode workers stop straight away
+    try:
+        for batch in batches:
+            yield batch
+            if cancelled():
+                return
+    finally:
+        batches.close()
+
+
+def encode_texts(prompts, model, device):
+    # (len(prompts), D) unit-norm text embeddings from one forward pass
+    import torch
+    import open_clip
+    text_tokens = open_clip.tokenize(list(prompts)).to(device)
+    with torch.no_grad():
+        return model.encode_text(text_tokens, normalize=True).cpu().numpy()
+
+
+class SearchEngine:
+    def __init__(self, model_name=MODEL_NAME, pretrained=PRETRAINED, device=None,
+                 extensions=IMAGE_EXTENSIONS, cache_dir=None, batch_size=DEFAULT_BATCH_SIZE,
+                 decode_workers=DEFAULT_WORKERS, prefetch_batches=DEFAULT_PREFETCH,
+                 ann_backend="auto", quantization=DEFAULT_QUANTIZATION,
+                 prompt_cache_size=DEFAULT_PROMPT_CACHE_SIZE, persist_prompts=PERSIST_PROMPT_CACHE,
+                 thumbnails=GENERATE_THUMBNAILS, scan_options=None):
+        self.model_name = model_name
+        self.pretrained = pretrained
+        self.device = device
+        self.extensions = tuple(extensions)
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers
+        self.prefetch_batches = prefetch_batches
+        self.ann_backend = ann_backend
+        self.quantization = quantization
+        # recursive / include / exclude / workers, see folder_scan.py
+        self.scan_options = scan_options
+
+        self.model = None
+        self.preprocess = None
+        self.model_error = None
+        self.model_ready = threading.Event()
+        self._model_lock = threading.Lock()
+
+        prompt_cache_path = None
+        if persist_prompts:
+            prompt_cache_path = os.path.join(
+                cache_dir or DEFAULT_CACHE_DIR, f"prompts_{model_name}_{pretrained or 'random'}.npz"
+            )
+        self.prompt_cache = PromptCache(prompt_cache_size, prompt_cache_path)
+        self.result_cache = ResultCache()
+        # Result-card thumbnails, cut from the images indexing decodes anyway
+        self.thumbnail_store = None
+        if thumbnails:
+            self.thumbnail_store = ThumbnailStore(os.path.join(cache_dir or DEFAULT_CACHE_DIR, "thumbnails.sqlite"))
+
+        self.indexes = {}
+        # Guards the dicts below.  Each folder then has its own locks, so indexing one
+        # folder never holds up searches of another, nor of itself while images encode:
+        #   folder_locks - held while the index is read or changed in memory
+        #   update_locks - held for a whole refresh, so only one runs per folder
+        self.index_lock = threading.Lock()
+        self.folder_locks = {}
+        self.update_locks = {}
+        # One folder encodes at a time, they share the model and self.progress
+        self.encode_lock = threading.Lock()
+        # Indexing progress, polled by the apps instead of pushed per image
+        self.progress = Progress()
+        self.folder_path = None
+
+    # Model
+
+    def load_model(self):
+        # Safe to call from several threads; returns the load time in seconds
+        with self._model_lock:
+            if self.model is not None:
+                return 0.0
+            try:
+                self.model, self.preprocess, self.device, load_time = load_clip_model(
+                    self.model_name, self.pretrained, self.device
+                )
+            except Exception as e:
+                self.model_error = e
+                raise
+            finally:
+                self.model_ready.set()
+            return load_time
+
+    def wait_for_model(self, timeout=None):
+        if not self.model_ready.is_set() and not self._model_lock.locked():
+            # Nobody is loading it yet, load on this thread
+            self.load_model()
+        self.model_ready.wait(timeout)
+        if self.model is None:
+            raise RuntimeError(f"AI model is not available: {self.model_error}")
+
+    def encode_text(self, prompt):
+        return self.encode_texts([prompt])
+
+    def encode_texts(self, prompts):
+        # Cached prompts skip the text tower, the rest are encoded in one batch
+        prompts = list(prompts)
+        vectors = [self.prompt_cache.get(prompt) for prompt in prompts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            self.wait_for_model()
+            encoded = encode_texts([prompts[i] for i in missing], self.model, self.device)
+            for i, vector in zip(missing, encoded):
+                self.prompt_cache.put(prompts[i], vector)
+                vectors[i] = vector
+        return np.stack(vectors)
+
+    def close(self):
+        self.prompt_cache.save()
+
+    # Indexing
+
+    def _locks(self, folder_path):
+        # (folder lock, update lock) for the folder, see __init__
+        with self.index_lock:
+            if folder_path not in self.folder_locks:
+                self.folder_locks[folder_path] = threading.RLock()
+                self.update_locks[folder_path] = threading.Lock()
+            return self.folder_locks[folder_path], self.update_locks[folder_path]
+
+    def get_index(self, folder_path, status=None, refresh=True, cancelled=None):
+        # Cached index for the folder, with only new or changed files encoded.
+        # refresh=False skips the folder scan once the index is in memory.
+        # cancelled() is checked between batches; images encoded so far are kept
+        # and the rest are picked up by the next refresh.
+        self.wait_for_model()
+        index = self.indexes.get(folder_path)
+        if index is not None and not refresh:
+            return index
+
+        lock, update_lock = self._locks(folder_path)
+        with update_lock:
+            index = self.indexes.get(folder_path)
+            if index is None:
+                index = EmbeddingIndex(
+                    folder_path, self.model_name, self.pretrained, self.extensions, self.cache_dir,
+                    ann_backend=self.ann_backend, quantization=self.quantization,
+                    scan_options=self.scan_options
+                )
+                index.load()
+                with self.index_lock:
+                    self.indexes[folder_path] = index
+
+            # One folder scan serves both the staleness check and the refresh.  Nothing
+            # else changes the index while update_lock is held, so searches go on meanwhile.
+            current = index.current_files()
+            if index.is_stale(current):
+                if status:
+                    status("Checking for changed images...")
+                with lock:
+                    pending = index.refresh(current=current)
+                self._update(index, pending, status, cancelled)
+            else:
+                # Nothing was refreshed, don't report the previous run's changes again
+                index.last_changes = dict.fromkeys(index.last_changes, 0)
+
+            return index
+
+    def _update(self, index, pending, status=None, cancelled=None):
+        # Encode the paths a refresh returned and save the index; call with the folder's
+        # update lock held.  Its folder lock is only taken to swap in the new rows and
+        # to save, so searches keep running against the index while images encode.
+        lock, _ = self._locks(index.folder_path)
+        if pending:
+            if status:
+                status(f"Indexing {len(pending)} new or changed images...")
+            batches = iter_preprocessed_batches(
+                pending, self.preprocess, self.batch_size,
+                workers=self.decode_workers, prefetch=self.prefetch_batches,
+                min_size=model_input_size(self.model),
+                thumbnail_sizes=THUMBNAIL_SIZES,
+                on_thumbnails=self.thumbnail_store.put_batch if self.thumbnail_store else None,
+                on_failed=index.mark_undecodable
+            )
+            if cancelled:
+                batches = until_cancelled(batches, cancelled)
+            with self.encode_lock:
+                self.progress.start(len(pending), "Indexing")
+                try:
+                    index.add(self.progress.track(encode_batches(batches, self.model, self.device)), lock=lock)
+                finally:
+                    self.progress.finish()
+        stopped = cancelled is not None and cancelled()
+        with lock:
+            if index.unsaved:
+                index.save()
+        if any(index.last_changes.values()):
+            self.result_cache.invalidate(index.folder_path)
+        if stopped:
+            raise SearchCancelled()
+
+    def update_files(self, folder_path, paths=None, status=None):
+        # Re-encode just the given changed paths (None: rescan the folder), e.g. from a
+        # FolderWatcher.  Returns the changes, or None if the folder's index isn't loaded.
+        self.wait_for_model()
+        index = self.indexes.get(folder_path)
+        if index is None:
+            return None
+        lock, update_lock = self._locks(folder_path)
+        with update_lock:
+            with lock:
+                pending = index.refresh(paths)
+            self._update(index, pending, status)
+            return dict(index.last_changes)
+
+    def folder_stats(self, folder_path):
+        # Image counts without scanning the folder: from the index in memory, or else
+        # from its manifest alone (embeddings and ANN state are left on disk).
+        # None if the folder was never indexed.
+        index = self.indexes.get(folder_path)
+        if index is not None:
+            with self._locks(folder_path)[0]:
+                return index.folder_stats()
+        index = EmbeddingIndex(folder_path, self.model_name, self.pretrained, self.extensions, self.cache_dir)
+        manifest = index.read_manifest()
+        return index.folder_stats(manifest) if manifest is not None else None
+
+    def index(self, folder_path, status=None, refresh=True, cancelled=None):
+        index = self.get_index(folder_path, status, refresh, cancelled)
+        self.folder_path = folder_path
+        return index
+
+    def index_summary(self, folder_path, status=None):
+        start = time.perf_counter()
+        index = self.index(folder_path, status)
+        return {"folder": folder_path, "images": len(index), "skipped": len(index.skipped),
+                "seconds": round(time.perf_counter() - start, 3), **index.last_changes}
+
+    # Search
+
+    def search(self, prompt, k=8, threshold=None, folder_path=None, status=None, refresh=True, cancelled=None):
+        # Top-k (path, cosine similarity) pairs for the prompt, best first.
+        # Text encoding runs concurrently across callers; scoring holds the folder's
+        # lock so it never sees an index halfway through a refresh.
+        # Raises SearchCancelled once cancelled() is true, checked between stages
+        # and between indexing batches.
+        cancelled = cancelled or (lambda: False)
+        folder_path = folder_path or self.folder_path
+        if not folder_path:
+            raise ValueError("No folder has been indexed yet")
+
+        if status:
+            status("Encoding search query...")
+        text_features = self.encode_text(prompt)
+
+        if cancelled():
+            raise SearchCancelled()
+        index = self.index(folder_path, status, refresh, cancelled)
+        with self._locks(folder_path)[0]:
+            if cancelled():
+                raise SearchCancelled()
+            version = index.fingerprint()
+            hits = self.result_cache.get(folder_path, version, text_features, k, threshold)
+            if hits is not None:
+                return hits
+
+            if status:
+                status("Analyzing images...")
+            # Rank deeper than asked, so other result counts and thresholds are cache hits
+            depth = max(k, self.result_cache.depth)
+            hits = index.search(text_features, depth)
+            self.result_cache.put(folder_path, version, text_features, hits, depth)
+            return cut(hits, k, threshold)
+
+    def search_features(self, text_features, k=8, threshold=None, folder_path=None, refresh=True):
+        # One result list per row of already-encoded (Q, D) text features
+        folder_path = folder_path or self.folder_path
+        if not folder_path:
+            raise ValueError("No folder has been indexed yet")
+        index = self.index(folder_path, refresh=refresh)
+        with self._locks(folder_path)[0]:
+            return index.search_batch(text_features, k, threshold=threshold)
+
+
+def write_results(results, output_format, stream=sys.stdout):
+    rows = [{"rank": i, "path": path, "score": round(score, 6)} for i, (path, score) in enumerate(results, 1)]
+    if output_format == "csv":
+        writer = csv.DictWriter(stream, fieldnames=["rank", "path", "score"])
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        json.dump(rows, stream, indent=2)
+        stream.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CLIP image search without the desktop UI")
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--pretrained", default=PRETRAINED)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="decode worker processes")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--quiet", action="store_true", help="don't report progress on stderr")
+    parser.add_argument("--no-recursive", dest="recursive", action="store_false",
+                        default=DEFAULT_SCAN_OPTIONS["recursive"], help="only index the top-level folder")
+    parser.add_argument("--include", action="append", default=None, help="glob images must match (repeatable)")
+    parser.add_argument("--exclude", action="append", default=None, help="glob of images or folders to skip (repeatable)")
+    parser.add_argument("--scan-workers", type=int, default=DEFAULT_SCAN_OPTIONS["workers"],
+                        help="threads listing directories, for network mounts")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="build or update the index for a folder")
+    index_parser.add_argument("folder")
+
+    search_parser = subparsers.add_parser("search", help="search a folder by text prompt")
+    search_parser.add_argument("folder")
+    search_parser.add_argument("prompt")
+    search_parser.add_argument("-k", type=int, default=8)
+    search_parser.add_argument("--threshold", type=float, default=None)
+    search_parser.add_argument("--format", choices=["json", "csv"], default="json")
+
+    args = parser.parse_args(argv)
+    scan_options = {
+        "recursive": args.recursive,
+        "include": args.include if args.include is not None else DEFAULT_SCAN_OPTIONS["include"],
+        "exclude": args.exclude if args.exclude is not None else DEFAULT_SCAN_OPTIONS["exclude"],
+        "workers": args.scan_workers,
+    }
+    engine = SearchEngine(
+        pretrained=args.pretrained, device=args.device, cache_dir=args.cache_dir,
+        batch_size=args.batch_size, decode_workers=args.workers, scan_options=scan_options
+    )
+    status = None if args.quiet else lambda text: print(text, file=sys.stderr)
+    folder = os.path.abspath(args.folder)
+
+    if args.command == "index":
+        json.dump(engine.index_summary(folder, status), sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        results = engine.search(args.prompt, args.k, args.threshold, folder, status)
+        write_results(results, args.format)
+    engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from search_engine import SearchEngine, SearchCancelled
+from thumbnail_cache import ThumbnailStore
+from progress import Progress
+from query_batcher import QueryBatcher, DEFAULT_MAX_WAIT, DEFAULT_MAX_BATCH
+from image_pipeline import DEFAULT_WORKERS
+from clip_model import PRETRAINED
+
+# Local HTTP front-end for SearchEngine: one warm model and one set of loaded
+# indexes shared by every client, each request served on its own thread.
+#
+#   python search_server.py --folder /photos
+#
+#   GET /health                                  model state and loaded folders
+#   GET /index?folder=/photos                    build or update an index
+#   GET /stats?folder=/photos                    image counts from the index manifest
+#   GET /search?q=a+cat&k=8&threshold=0.2        search the last indexed folder
+#   GET /search?q=a+cat&folder=/photos           search a specific folder
+#
+# Concurrent searches are coalesced by a QueryBatcher (--max-batch 1 turns it off).
+#
+# Setting EDAI_SEARCH_SERVER=http://127.0.0.1:8765 makes both desktop apps use
+# RemoteSearchEngine against the server instead of loading a model of their own.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+SERVER_URL = os.environ.get("EDAI_SEARCH_SERVER", "")
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    engine = None  # set by make_server
+    batcher = None
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        routes = {"/health": self.health, "/index": self.index, "/stats": self.stats, "/search": self.search}
+        route = routes.get(url.path.rstrip("/") or "/")
+        if route is None:
+            self.send_json(404, {"error": f"Unknown endpoint: {url.path}"})
+            return
+        try:
+            self.send_json(200, route(params))
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            print(f"Error handling {self.path}: {e}")
+            self.send_json(500, {"error": str(e)})
+
+    do_POST = do_GET
+
+    def health(self, params):
+        return {
+            "model_ready": self.engine.model is not None,
+            "model_error": str(self.engine.model_error) if self.engine.model_error else None,
+            "folder": self.engine.folder_path,
+            "folders": sorted(self.engine.indexes),
+        }
+
+    def index(self, params):
+        folder = params.get("folder") or self.engine.folder_path
+        if not folder:
+            raise ValueError("Missing 'folder' parameter")
+        return self.engine.index_summary(os.path.abspath(folder))
+
+    def stats(self, params):
+        folder = params.get("folder") or self.engine.folder_path
+        if not folder:
+            raise ValueError("Missing 'folder' parameter")
+        return self.engine.folder_stats(os.path.abspath(folder))
+
+    def search(self, params):
+        prompt = params.get("q", "").strip()
+        if not prompt:
+            raise ValueError("Missing 'q' parameter")
+        k = int(params.get("k", 8))
+        threshold = float(params["threshold"]) if params.get("threshold") else None
+        folder = os.path.abspath(params["folder"]) if params.get("folder") else None
+
+        start = time.perf_counter()
+        # The folder is only rescanned on /index, searches use the index in memory
+        if self.batcher is not None:
+            results = self.batcher.search(prompt, k, threshold, folder)
+        else:
+            results = self.engine.search(prompt, k, threshold=threshold, folder_path=folder, refresh=False)
+        return {
+            "query": prompt,
+            "seconds": round(time.perf_counter() - start, 4),
+            "results": [{"path": path, "score": score} for path, score in results],
+        }
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(engine, host=DEFAULT_HOST, port=DEFAULT_PORT, quiet=False, batcher=None):
+    handler = type("BoundSearchRequestHandler", (SearchRequestHandler,), {"engine": engine, "batcher": batcher})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.quiet = quiet
+    return server
+
+
+class RemoteSearchEngine:
+    # Client with the SearchEngine calls the desktop apps use, backed by a running server
+
+    def __init__(self, url=SERVER_URL, timeout=600):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.folder_path = None
+        self.decode_workers = DEFAULT_WORKERS  # decoding happens in the server
+        self.prompt_cache = None  # prompts are cached by the server
+        self.thumbnail_store = ThumbnailStore()  # on this machine, filled by the server's indexing
+        self.progress = Progress()  # indexing happens in the server, never started here
+
+    def request(self, endpoint, **params):
+        params = {key: value for key, value in params.items() if value is not None}
+        url = f"{self.url}{endpoint}?{urllib.parse.urlencode(params)}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.load(e).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise RuntimeError(f"Search server error: {message}") from None
+
+    def load_model(self, poll_interval=0.5):
+        # Waits until the server's model is ready, returns the time spent waiting
+        start = time.perf_counter()
+        while True:
+            health = self.request("/health")
+            if health["model_ready"]:
+                return time.perf_counter() - start
+            if health["model_error"]:
+                raise RuntimeError(f"AI model is not available: {health['model_error']}")
+            time.sleep(poll_interval)
+
+    def index_summary(self, folder_path, status=None):
+        if status:
+            status("Indexing on the search server...")
+        summary = self.request("/index", folder=folder_path)
+        self.folder_path = folder_path
+        return summary
+
+    def index(self, folder_path, status=None):
+        return self.index_summary(folder_path, status)
+
+    def update_files(self, folder_path, paths=None, status=None):
+        # The server rescans the whole folder, it can't see this machine's change list
+        summary = self.index_summary(folder_path, status)
+        return {key: summary[key] for key in ("added", "modified", "deleted", "renamed")}
+
+    def folder_stats(self, folder_path):
+        return self.request("/stats", folder=folder_path)
+
+    def search(self, prompt, k=8, threshold=None, folder_path=None, status=None, refresh=True, cancelled=None):
+        # The server only rescans on /index, so refresh is implied by switching folders.
+        # It can't be interrupted mid-request, cancelled() is checked around each call.
+        cancelled = cancelled or (lambda: False)
+        folder_path = folder_path or self.folder_path
+        if not folder_path:
+            raise ValueError("No folder has been indexed yet")
+        if folder_path != self.folder_path:
+            # Make sure the server has picked up this folder's current contents
+            self.index_summary(folder_path, status)
+        if cancelled():
+            raise SearchCancelled()
+        if status:
+            status("Searching...")
+        response = self.request("/search", q=prompt, k=k, threshold=threshold, folder=folder_path)
+        if cancelled():
+            raise SearchCancelled()
+        return [(hit["path"], hit["score"]) for hit in response["results"]]
+
+    def close(self):
+        pass
+
+
+def create_engine(**kwargs):
+    # Engine for the desktop apps: the shared server if one is configured, else in-process
+    if SERVER_URL:
+        return RemoteSearchEngine(SERVER_URL)
+    return SearchEngine(**kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve CLIP image search over HTTP on this machine")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--folder", action="append", default=[], help="index at startup, may be repeated")
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--pretrained", default=PRETRAINED)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="decode worker processes")
+    parser.add_argument("--batch-wait-ms", type=float, default=DEFAULT_MAX_WAIT * 1000,
+                        help="how long a search waits for others to share its text-encoder batch")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="1 disables batching")
+    parser.add_argument("--quiet", action="store_true", help="don't log requests")
+    args = parser.parse_args(argv)
+
+    engine = SearchEngine(pretrained=args.pretrained, device=args.device,
+                          cache_dir=args.cache_dir, decode_workers=args.workers)
+    batcher = QueryBatcher(engine, args.batch_wait_ms / 1000.0, args.max_batch) if args.max_batch > 1 else None
+    server = make_server(engine, args.host, args.port, args.quiet, batcher)
+
+    def warm_up():
+        try:
+            print(f"Model loaded in {engine.load_model():.2f}s")
+            for folder in args.folder:
+                summary = engine.index_summary(os.path.abspath(folder))
+                print(f"Indexed {summary['folder']}: {summary['images']} images")
+        except Exception as e:
+            print(f"Error warming up search server: {e}")
+
+    # Serve /health straight away, searches wait for the model
+    threading.Thread(target=warm_up, daemon=True).start()
+    print(f"Serving image search on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import os
+import io
+import sqlite3
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageOps
+from embedding_index import DEFAULT_CACHE_DIR
+
+# Result-card thumbnails, so showing results never decodes the originals.
+#
+#   ThumbnailStore - one SQLite file of square JPEG thumbnails at THUMBNAIL_SIZES
+#                    (grid, detailed and list cards), plus each original's
+#                    dimensions, keyed by path and valid while its mtime matches.
+#                    Filled during indexing from the already-decoded images.
+#   ThumbnailCache - bounded in-memory LRU in front of the store, holding
+#                    ready-to-display objects (CTkImage in the apps).  A thumbnail
+#                    missing from the store is made from the original once.
+
+THUMBNAIL_SIZES = (280, 150, 100)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_DB = os.path.join(DEFAULT_CACHE_DIR, "thumbnails.sqlite")
+GENERATE_THUMBNAILS = os.environ.get("EDAI_THUMBNAILS", "1") != "0"
+DEFAULT_MEMORY_THUMBNAILS = 256
+
+
+def make_thumbnails(img, sizes=THUMBNAIL_SIZES):
+    # {size: JPEG bytes} of square center crops, largest first so each is cut from the previous one
+    thumbnails = {}
+    for size in sorted(sizes, reverse=True):
+        img = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=THUMBNAIL_QUALITY)
+        thumbnails[size] = buffer.getvalue()
+    return thumbnails
+
+
+class ThumbnailStore:
+    def __init__(self, path=THUMBNAIL_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        # Shared by the indexing and UI threads, and possibly by a search server process
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS thumbnails ("
+            "path TEXT, size INTEGER, mtime REAL, width INTEGER, height INTEGER, data BLOB, "
+            "PRIMARY KEY (path, size))"
+        )
+        self.db.commit()
+
+    def get(self, img_path, size, mtime):
+        # (JPEG bytes, (width, height) of the original), or None if missing or outdated
+        with self.lock:
+            row = self.db.execute(
+                "SELECT data, width, height, mtime FROM thumbnails WHERE path = ? AND size = ?",
+                (img_path, size)
+            ).fetchone()
+        if row is None or row[3] != mtime:
+            return None
+        return row[0], (row[1], row[2])
+
+    def put_many(self, entries):
+        # entries: (path, mtime, (width, height), {size: JPEG bytes})
+        rows = [
+            (img_path, size, mtime, original_size[0], original_size[1], data)
+            for img_path, mtime, original_size, thumbnails in entries
+            for size, data in thumbnails.items()
+        ]
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.db.commit()
+
+    def put_batch(self, paths, thumbnails):
+        # Pipeline callback: thumbnails[i] is ((width, height), {size: bytes}) for paths[i]
+        entries = []
+        for img_path, (original_size, sizes) in zip(paths, thumbnails):
+            try:
+                entries.append((img_path, os.path.getmtime(img_path), original_size, sizes))
+            except OSError:
+                continue
+        try:
+            self.put_many(entries)
+        except sqlite3.Error as e:
+            print(f"Error saving thumbnails: {e}")
+
+
+class ThumbnailCache:
+    def __init__(self, store=None, image_factory=None, max_entries=DEFAULT_MEMORY_THUMBNAILS):
+        # image_factory turns a PIL thumbnail into what the UI displays, e.g. a CTkImage
+        self.store = store
+        self.image_factory = image_factory or (lambda img: img)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (path, size, mtime) -> (image, original size)
+        self.lock = threading.Lock()
+
+    def peek(self, img_path, size):
+        # In-memory entry only, never touches the store or the original
+        try:
+            key = (img_path, size, os.path.getmtime(img_path))
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def load(self, img_path, size):
+        # (PIL thumbnail, (width, height) of the original) from the store, or made from
+        # the original on a miss.  Safe to call from worker threads.
+        mtime = os.path.getmtime(img_path)
+        stored = self.store.get(img_path, size, mtime) if self.store else None
+        if stored is not None:
+            data, original_size = stored
+        else:
+            with Image.open(img_path) as original:
+                original_size = original.size
+                # Every stored size is cut from this decode, so it has to cover the largest
+                largest = max(THUMBNAIL_SIZES)
+                original.draft("RGB", (largest * 2, largest * 2))
+                thumbnails = make_thumbnails(original.convert("RGB"))
+            if self.store:
+                try:
+                    self.store.put_many([(img_path, mtime, original_size, thumbnails)])
+                except sqlite3.Error as e:
+                    print(f"Error saving thumbnails: {e}")
+            data = thumbnails[size]
+        img = Image.open(io.BytesIO(data))
+        img.load()
+        return img, original_size
+
+    def add(self, img_path, size, img, original_size):
+        # Wrap a loaded thumbnail for display and keep it; call from the UI thread
+        entry = (self.image_factory(img), original_size)
+        try:
+            key = (img_path, size, os.path.getmtime(img_path))
+        except OSError:
+            return entry
+        with self.lock:
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def get(self, img_path, size):
+        # (display image, (width, height) of the original), loading synchronously on a miss
+        entry = self.peek(img_path, size)
+        if entry is None:
+            entry = self.add(img_path, size, *self.load(img_path, size))
+        return entry
@@ -0,0 +1,42 @@
+import os
+import time
+
+# Main-thread responsiveness probe for the Tk apps.
+#
+# StallMonitor re-arms a short after() timer and treats any lateness beyond the
+# timer interval as time the event loop was blocked, e.g. by decoding images in a
+# callback.  Enable it with EDAI_STALL_MONITOR=1; the apps then print the longest
+# and total stall for each rendered result set:
+#
+#   [stall] render results: longest 412 ms, total 1190 ms over 2.31s
+
+STALL_MONITOR = os.environ.get("EDAI_STALL_MONITOR", "0") != "0"
+
+
+class StallMonitor:
+    def __init__(self, widget, interval_ms=15, min_stall_ms=5):
+        self.widget = widget
+        self.interval = interval_ms / 1000.0
+        self.min_stall = min_stall_ms / 1000.0
+        self.reset()
+        self.expected = time.perf_counter() + self.interval
+        self.widget.after(interval_ms, self._tick)
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.longest = 0.0
+        self.total = 0.0
+
+    def _tick(self):
+        now = time.perf_counter()
+        stall = now - self.expected
+        if stall > self.min_stall:
+            self.longest = max(self.longest, stall)
+            self.total += stall
+        self.expected = now + self.interval
+        self.widget.after(int(self.interval * 1000), self._tick)
+
+    def report(self, label):
+        print(f"[stall] {label}: longest {self.longest * 1000:.0f} ms, total {self.total * 1000:.0f} ms "
+              f"over {time.perf_counter() - self.started:.2f}s")
+        self.reset()
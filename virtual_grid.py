@@ -0,0 +1,124 @@
+import math
+import tkinter as tk
+import customtkinter as ctk
+
+# Windowed results view.  Only rows inside the viewport (plus `overscan` rows on
+# either side) have card widgets; when a card scrolls out of view it is re-bound
+# to a result coming into view instead of being destroyed, so showing 1,000
+# results builds about as many widgets as showing 20.
+#
+#   build_card(parent) -> widget         create an empty card
+#   bind_card(card, item)                show item in an existing card
+#
+# Every row has the same fixed height, which is what makes the visible range a
+# simple division of the scroll offset.
+
+
+class VirtualGrid(ctk.CTkFrame):
+    def __init__(self, master, overscan=1, padding=10, **kwargs):
+        super().__init__(master, **kwargs)
+        self.overscan = overscan
+        self.padding = padding
+        self.items = []
+        self.columns = 1
+        self.row_height = 100
+        self.build_card = None
+        self.bind_card = None
+        self.slots = []  # [card, canvas window id, index of the bound item or None]
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.canvas = tk.Canvas(
+            self, highlightthickness=0, yscrollincrement=20,
+            bg=self._apply_appearance_mode(self.cget("fg_color"))
+        )
+        self.scrollbar = ctk.CTkScrollbar(self, orientation="vertical", command=self.on_scrollbar)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.canvas.bind("<Configure>", lambda e: self.refresh())
+        self.bind_all("<MouseWheel>", self.on_mousewheel, add="+")
+        self.bind_all("<Button-4>", self.on_mousewheel, add="+")
+        self.bind_all("<Button-5>", self.on_mousewheel, add="+")
+
+    def set_items(self, items, build_card, bind_card, columns=1, row_height=100, keep_position=False):
+        # keep_position=True updates the shown items in place: the scroll offset is kept
+        # and cards whose slot still shows an equal item aren't re-bound
+        items = list(items)
+        incremental = (keep_position and build_card == self.build_card
+                       and max(1, columns) == self.columns and row_height == self.row_height)
+        if build_card != self.build_card:
+            # Different kind of card, the pooled widgets can't be reused
+            for card, window, _ in self.slots:
+                self.canvas.delete(window)
+                card.destroy()
+            self.slots = []
+        for slot in self.slots:
+            if not incremental or slot[2] is None or slot[2] >= len(items) or items[slot[2]] != self.items[slot[2]]:
+                slot[2] = None
+        self.items = items
+        self.build_card = build_card
+        self.bind_card = bind_card
+        self.columns = max(1, columns)
+        self.row_height = row_height
+        if not incremental:
+            self.canvas.yview_moveto(0)
+        self.refresh()
+
+    def clear(self):
+        self.set_items([], self.build_card, self.bind_card, self.columns, self.row_height)
+
+    def on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self.refresh()
+
+    def on_mousewheel(self, event):
+        # Global binding, only scroll when the pointer is over this view
+        if not str(event.widget).startswith(str(self)) or not self.winfo_ismapped():
+            return
+        if event.num == 4:
+            steps = -3
+        elif event.num == 5:
+            steps = 3
+        else:
+            steps = -int(event.delta / 120) * 3 if abs(event.delta) >= 120 else -event.delta
+        self.canvas.yview_scroll(steps, "units")
+        self.refresh()
+
+    def refresh(self):
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        rows = math.ceil(len(self.items) / self.columns)
+        self.canvas.configure(scrollregion=(0, 0, width, max(rows * self.row_height, height)))
+
+        top = self.canvas.canvasy(0)
+        first_row = max(0, int(top // self.row_height) - self.overscan)
+        last_row = min(rows, int((top + height) // self.row_height) + 1 + self.overscan)
+        needed = range(first_row * self.columns, min(len(self.items), last_row * self.columns))
+
+        while len(self.slots) < len(needed):
+            card = self.build_card(self.canvas)
+            window = self.canvas.create_window(0, 0, window=card, anchor="nw", state="hidden")
+            self.slots.append([card, window, None])
+
+        # Cards already showing a needed item stay put, the rest are re-bound
+        bound = {slot[2]: slot for slot in self.slots if slot[2] in needed}
+        free = [slot for slot in self.slots if slot[2] not in needed]
+        cell_width = width / self.columns
+        for index in needed:
+            slot = bound.get(index)
+            if slot is None:
+                slot = free.pop()
+                self.bind_card(slot[0], self.items[index])
+                slot[2] = index
+            row, col = divmod(index, self.columns)
+            self.canvas.coords(slot[1], col * cell_width + self.padding, row * self.row_height + self.padding)
+            self.canvas.itemconfigure(
+                slot[1], state="normal",
+                width=max(1, cell_width - 2 * self.padding), height=max(1, self.row_height - 2 * self.padding)
+            )
+
+        for slot in free:
+            self.canvas.itemconfigure(slot[1], state="hidden")
+            slot[2] = None